@@ -7,19 +7,2594 @@ import cv2
 import numpy as np
 from PIL import Image, ImageTk
 import os
-from threading import Thread
+import sys
+import shutil
+import subprocess
+import tempfile
+import random
+import re
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then not reported
+    resource = None
+import multiprocessing
+import argparse
+from dataclasses import dataclass, asdict, fields, replace
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from threading import Thread, Lock, Event
+import queue
+from collections import OrderedDict
+from bisect import bisect_left, bisect_right
+import hashlib
+import json
 import time
 import math
+import cProfile
+import sqlite3
+from contextlib import contextmanager, nullcontext
+
+# Decoding through a gap of this many frames is assumed to cost about as much as
+# a real seek, which has to re-decode from the previous keyframe anyway
+SEEK_THRESHOLD = 48
+
+# With a keyframe index a seek only pays off when it skips at least this many frames
+SEEK_OVERHEAD_FRAMES = 4
+
+# Set to a non-empty value other than 0 to dump a cProfile of each export next to its output
+PROFILE_ENV_VAR = 'SIMPLE_VIDEO_CROPPER_PROFILE'
+
+# Background work reports progress at most this often, and the UI picks up events from
+# worker threads this often
+PROGRESS_INTERVAL = 0.2
+UI_POLL_MS = 50
+
+# Filmstrip under the timeline
+FILMSTRIP_THUMBNAILS = 12
+FILMSTRIP_HEIGHT = 48
+
+# Scene detection compares luma downscaled to this width, in batches of this many frames.
+# A cut needs a mean difference above SCENE_THRESHOLD (0-255) and SCENE_RATIO times the
+# median difference around it, so fast motion alone doesn't count
+SCENE_WIDTH = 64
+SCENE_BATCH = 256
+SCENE_THRESHOLD = 20.0
+SCENE_RATIO = 3.0
+SCENE_MIN_FRAMES = 8
+# The GUI scores this many frames per second of video and pins each cut down between samples
+SCENE_SAMPLES_PER_SECOND = 6
+
+# Auto crop stacks this many frames, downscaled to at most this width. A row or column is border
+# when it barely changes over time (or, in a static video, is flat within each frame)
+AUTO_CROP_SAMPLES = 16
+AUTO_CROP_WIDTH = 960
+AUTO_CROP_ACTIVITY = 0.15
+AUTO_CROP_FLATNESS = 6.0
+
+# Resampling filters a job's final resize can use
+INTERPOLATIONS = {
+    'nearest': cv2.INTER_NEAREST,
+    'linear': cv2.INTER_LINEAR,
+    'cubic': cv2.INTER_CUBIC,
+    'area': cv2.INTER_AREA,
+    'lanczos': cv2.INTER_LANCZOS4,
+}
+
+# Per-video caches (seek indexes, ...) live here, keyed by path, size and mtime
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "simple-video-cropper")
+
+def video_fingerprint(path):
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def cache_file(path, suffix):
+    return os.path.join(CACHE_DIR, f"{video_fingerprint(path)}.{suffix}")
+
+class SeekIndex:
+    # True frame count and keyframe positions of a video, found in one linear pass
+    def __init__(self, frame_count, keyframes):
+        self.frame_count = frame_count
+        self.keyframes = keyframes
+    
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(cache_file(path, 'index.json'), 'r') as f:
+                data = json.load(f)
+            return cls(data['frame_count'], data['keyframes'])
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    @classmethod
+    def build(cls, path):
+        # Read packets without decoding them (FFmpeg raw mode) and note which ones are keyframes
+        cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+        if not cap.isOpened():
+            return None
+        
+        frame_count = 0
+        keyframes = []
+        while cap.grab():
+            if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME) > 0:
+                keyframes.append(frame_count)
+            frame_count += 1
+        cap.release()
+        
+        if frame_count == 0:
+            return None
+        # A stream without keyframe flags can't be used to plan seeks
+        if not keyframes or keyframes[0] != 0:
+            keyframes = []
+        return cls(frame_count, keyframes)
+    
+    def save(self, path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_file(path, 'index.json'), 'w') as f:
+            json.dump({'path': os.path.abspath(path), 'frame_count': self.frame_count,
+                       'keyframes': self.keyframes}, f)
+    
+    @classmethod
+    def load_or_build(cls, path):
+        index = cls.load(path)
+        if index is None:
+            index = cls.build(path)
+            if index is not None:
+                try:
+                    index.save(path)
+                except OSError:
+                    pass
+        return index
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+class VideoIndex:
+    # Persistent metadata of probed videos, keyed by path, size and mtime so that only new or
+    # changed files are probed again. Every call opens its own connection, so any thread can use it
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(CACHE_DIR, "videos.sqlite")
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self.connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS videos (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+                       "frame_count INTEGER, fps REAL, width INTEGER, height INTEGER, error TEXT)")
+            db.execute("CREATE TABLE IF NOT EXISTS exports (input_path TEXT, output_path TEXT, exported_at REAL, "
+                       "PRIMARY KEY (input_path, output_path))")
+    
+    @contextmanager
+    def connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            # Commits on success, rolls back on errors
+            with db:
+                yield db
+        finally:
+            db.close()
+    
+    def scan(self, folder, workers=None, progress=None):
+        # Probe new and changed videos under folder in parallel and forget deleted ones.
+        # Returns (videos found, videos probed)
+        found = {}
+        for root, _, names in os.walk(folder):
+            for name in names:
+                if not name.lower().endswith(VIDEO_EXTENSIONS):
+                    continue
+                path = os.path.abspath(os.path.join(root, name))
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found[path] = (stat.st_size, stat.st_mtime_ns)
+        
+        prefix = os.path.join(os.path.abspath(folder), '')
+        with self.connect() as db:
+            known = {path: (size, mtime_ns) for path, size, mtime_ns in db.execute(
+                "SELECT path, size, mtime_ns FROM videos WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))}
+            db.executemany("DELETE FROM videos WHERE path = ?", [(path,) for path in known if path not in found])
+        
+        changed = [path for path, stat in found.items() if known.get(path) != stat]
+        rows = []
+        # Probing mostly waits on file I/O and container parsing, which release the GIL
+        with ThreadPoolExecutor(max_workers=workers or min(32, 2 * (os.cpu_count() or 1))) as executor:
+            futures = {executor.submit(probe_video, path): path for path in changed}
+            for done, future in enumerate(as_completed(futures), start=1):
+                path = futures[future]
+                try:
+                    info, error = future.result(), None
+                except Exception as e:
+                    # Remembered too, so unreadable files aren't probed on every scan
+                    info, error = {'frame_count': 0, 'fps': 0.0, 'width': 0, 'height': 0}, str(e)
+                rows.append((path, *found[path], info['frame_count'], info['fps'], info['width'], info['height'],
+                             error))
+                # Store in batches so an interrupted scan keeps most of its work
+                if len(rows) >= 100:
+                    self.store(rows)
+                    rows = []
+                if progress is not None:
+                    progress(done, len(changed))
+        self.store(rows)
+        return len(found), len(changed)
+    
+    def store(self, rows):
+        with self.connect() as db:
+            db.executemany("INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    
+    def query(self, folder, min_width=0, min_height=0, min_fps=0.0, max_fps=None, min_seconds=0.0,
+              max_seconds=None, exported=None):
+        # Indexed videos under folder that pass the filters, sorted by path
+        duration = "(CASE WHEN v.fps > 0 THEN v.frame_count / v.fps ELSE 0 END)"
+        is_exported = "EXISTS (SELECT 1 FROM exports e WHERE e.input_path = v.path)"
+        prefix = os.path.join(os.path.abspath(folder), '')
+        sql = (f"SELECT v.path, v.frame_count, v.fps, v.width, v.height, v.error, {duration}, {is_exported} "
+               f"FROM videos v WHERE substr(v.path, 1, ?) = ? AND v.width >= ? AND v.height >= ? "
+               f"AND v.fps >= ? AND {duration} >= ?")
+        params = [len(prefix), prefix, min_width, min_height, min_fps, min_seconds]
+        if max_fps is not None:
+            sql += " AND v.fps <= ?"
+            params.append(max_fps)
+        if max_seconds is not None:
+            sql += f" AND {duration} <= ?"
+            params.append(max_seconds)
+        if exported is not None:
+            sql += f" AND {is_exported} = ?"
+            params.append(int(exported))
+        sql += " ORDER BY v.path"
+        keys = ('path', 'frame_count', 'fps', 'width', 'height', 'error', 'seconds', 'exported')
+        with self.connect() as db:
+            return [dict(zip(keys, row), exported=bool(row[-1])) for row in db.execute(sql, params)]
+    
+    def record_export(self, input_path, output_path):
+        with self.connect() as db:
+            db.execute("INSERT OR REPLACE INTO exports VALUES (?, ?, ?)",
+                       (os.path.abspath(input_path), os.path.abspath(output_path), time.time()))
+
+def seek_target(frame_idx, position, keyframes=None, seek_threshold=SEEK_THRESHOLD):
+    # Frame to seek to before decoding forward to frame_idx, or None to keep decoding from position
+    forward = position is not None and position <= frame_idx
+    if keyframes:
+        keyframe = keyframes[max(0, bisect_right(keyframes, frame_idx) - 1)]
+        if forward and keyframe - position <= SEEK_OVERHEAD_FRAMES:
+            return None
+        return keyframe
+    if forward and frame_idx - position <= seek_threshold:
+        return None
+    return frame_idx
+
+def plan_decode(frame_indices, seek_threshold=SEEK_THRESHOLD, keyframes=None, position=None):
+    # Turn the wanted frame numbers into decoder steps: ('seek', n), ('skip', count),
+    # ('read', n) and ('repeat', n) for an index that was just decoded.
+    # position is the frame the capture will decode next, if known
+    plan = []
+    for frame_idx in frame_indices:
+        if position is not None and frame_idx == position - 1 and plan:
+            plan.append(('repeat', frame_idx))
+            continue
+        
+        target = seek_target(frame_idx, position, keyframes, seek_threshold)
+        if target is not None:
+            plan.append(('seek', target))
+            position = target
+        if frame_idx > position:
+            plan.append(('skip', frame_idx - position))
+        
+        plan.append(('read', frame_idx))
+        position = frame_idx + 1
+    return plan
+
+def read_frames(cap, frame_indices, seek_threshold=SEEK_THRESHOLD, keyframes=None, position=None, timer=None):
+    # Yield (frame_idx, frame) for every wanted frame, decoding contiguous runs
+    # sequentially and stopping at the first frame that can't be read
+    stage = timer.stage if timer is not None else null_stage
+    frame = None
+    for op, value in plan_decode(frame_indices, seek_threshold, keyframes, position):
+        if op == 'seek':
+            with stage('seek'):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, value)
+        elif op == 'skip':
+            # grab() decodes without the color conversion and copy of read()
+            with stage('skip'):
+                for _ in range(value):
+                    if not cap.grab():
+                        return
+        elif op == 'read':
+            with stage('decode'):
+                ret, frame = cap.read()
+            if not ret:
+                return
+            yield value, frame
+        else:
+            yield value, frame
+
+def to_display_frame(frame, size):
+    # Full-resolution BGR frame -> RGB frame resized for the canvas.
+    # Resizing first means the color conversion only touches the small image
+    frame_small = cv2.resize(frame, size)
+    return cv2.cvtColor(frame_small, cv2.COLOR_BGR2RGB, dst=frame_small)
+
+def build_proxy(video_path, proxy_path, size, cancel_event=None, progress=None):
+    # Encode an intra-only (MJPG) copy of the video at display resolution for previews.
+    # Returns True once proxy_path is complete
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    
+    # Write under a temporary name so a half-built proxy is never picked up
+    os.makedirs(os.path.dirname(proxy_path), exist_ok=True)
+    part_path = proxy_path + '.part.avi'
+    out = cv2.VideoWriter(part_path, cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+    out.set(cv2.VIDEOWRITER_PROP_QUALITY, 90)
+    
+    count = 0
+    cancelled = False
+    try:
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                cancelled = True
+                break
+            ret, frame = cap.read()
+            if not ret:
+                break
+            out.write(cv2.resize(frame, size, interpolation=cv2.INTER_AREA))
+            count += 1
+            if progress is not None and count % 25 == 0:
+                progress(count, total)
+    finally:
+        cap.release()
+        out.release()
+    
+    if cancelled or count == 0:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        return False
+    os.replace(part_path, proxy_path)
+    return True
+
+def thumbnail_indices(total_frames, count):
+    # Evenly spaced frame numbers, one from the middle of each of count slices
+    count = max(1, min(count, total_frames))
+    return [int((i + 0.5) * total_frames / count) for i in range(count)]
+
+def build_thumbnails(video_path, frame_indices, thumb_size, display_size, cancel_event=None,
+                     on_thumbnail=None, seek_threshold=SEEK_THRESHOLD, keyframes=None):
+    # Decode the given frames with sequential grab/skip and return them as an array of RGB thumbnails.
+    # on_thumbnail(i, frame_idx, thumb, display_frame) is called as each one becomes available
+    cap = cv2.VideoCapture(video_path)
+    thumbs = np.zeros((len(frame_indices), thumb_size[1], thumb_size[0], 3), dtype=np.uint8)
+    try:
+        for i, (frame_idx, frame) in enumerate(read_frames(cap, frame_indices, seek_threshold, keyframes)):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            display_frame = to_display_frame(frame, display_size)
+            thumbs[i] = cv2.resize(display_frame, thumb_size, interpolation=cv2.INTER_AREA)
+            if on_thumbnail is not None:
+                on_thumbnail(i, frame_idx, thumbs[i], display_frame)
+    finally:
+        cap.release()
+    return thumbs
+
+def luma_signature(frame, size):
+    # Area-averaging a full frame costs about as much as decoding it, so average a strided view
+    # instead, and downscale before converting so the color conversion only touches a few pixels
+    stride = max(1, frame.shape[1] // (4 * size[0]))
+    small = cv2.resize(frame[::stride, ::stride], size, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+def batch_differences(signatures):
+    # Mean absolute difference of each signature to the next, for a whole batch at once
+    signatures = signatures.astype(np.int16)
+    return np.abs(signatures[1:] - signatures[:-1]).mean(axis=(1, 2), dtype=np.float32)
+
+def every_nth_frame(cap, step):
+    # (frame_idx, frame) of every step-th frame until the end of the video. grab() still decodes
+    # the frames in between, it only saves their color conversion and copy
+    frame_idx = 0
+    while cap.grab():
+        if frame_idx % step == 0:
+            ret, frame = cap.retrieve()
+            if not ret:
+                return
+            yield frame_idx, frame
+        frame_idx += 1
+
+def scene_scores(video_path, step=1, cancel_event=None, progress=None):
+    # Luma differences between every step-th frame. Returns (sampled frame indices, differences)
+    # where differences[i] compares sample i with sample i + 1, or None when cancelled.
+    # With a seek index, steps long enough to pass keyframes seek over the frames in between;
+    # otherwise every frame is still decoded and a step only saves the signatures
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open {video_path}")
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    index = SeekIndex.load(video_path) if step > 1 else None
+    if index is not None:
+        total = index.frame_count
+        frames = read_frames(cap, range(0, total, step), keyframes=index.keyframes)
+    else:
+        frames = every_nth_frame(cap, step)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    size = (SCENE_WIDTH, max(1, round(SCENE_WIDTH * height / max(1, width))))
+    
+    # batch[0] carries the last signature of the previous batch, so batches chain up
+    batch = np.empty((SCENE_BATCH + 1, size[1], size[0]), dtype=np.uint8)
+    filled = 0
+    indices = []
+    scores = []
+    try:
+        for frame_idx, frame in frames:
+            batch[filled] = luma_signature(frame, size)
+            indices.append(frame_idx)
+            filled += 1
+            if filled == len(batch):
+                scores.append(batch_differences(batch))
+                batch[0] = batch[-1]
+                filled = 1
+                if cancel_event is not None and cancel_event.is_set():
+                    return None
+                if progress is not None:
+                    progress(frame_idx + 1, total)
+        if filled > 1:
+            scores.append(batch_differences(batch[:filled]))
+    finally:
+        cap.release()
+    return np.array(indices, dtype=np.int64), np.concatenate(scores) if scores else np.zeros(0, np.float32)
+
+def refine_cut(cap, start, end, size):
+    # The frame in (start, end] that differs most from the one before it
+    signatures = np.array([luma_signature(frame, size) for _, frame in read_frames(cap, range(start, end + 1))])
+    if len(signatures) < 2:
+        return end
+    return start + 1 + int(np.argmax(batch_differences(signatures)))
+
+def scene_cuts(frame_indices, scores, threshold=SCENE_THRESHOLD, ratio=SCENE_RATIO, min_frames=SCENE_MIN_FRAMES,
+               window=15):
+    # First frames of new scenes. Returns sample positions i where the cut lies in
+    # (frame_indices[i], frame_indices[i + 1]]
+    if len(scores) == 0:
+        return []
+    padded = np.pad(scores, window, mode='edge')
+    local = np.median(np.lib.stride_tricks.sliding_window_view(padded, 2 * window + 1), axis=1)
+    candidates = np.flatnonzero((scores > threshold) & (scores > ratio * local))
+    
+    # Of cuts closer than min_frames, keep the stronger one
+    kept = []
+    for i in candidates:
+        if kept and frame_indices[i + 1] - frame_indices[kept[-1] + 1] < min_frames:
+            if scores[i] > scores[kept[-1]]:
+                kept[-1] = i
+        else:
+            kept.append(i)
+    return kept
+
+def scene_step(fps):
+    # Sampling step for SCENE_SAMPLES_PER_SECOND at the given frame rate
+    return max(1, round((fps or 30.0) / SCENE_SAMPLES_PER_SECOND))
+
+def load_scene_cuts(video_path, step=1):
+    try:
+        with open(cache_file(video_path, f"scenes-{step}.json"), 'r') as f:
+            return json.load(f)['cuts']
+    except (OSError, ValueError, KeyError):
+        return None
+
+def detect_scenes(video_path, step=1, cancel_event=None, progress=None):
+    # Frame numbers where new scenes start, cached per video. None when cancelled.
+    # A step above 1 scores motion over several frames, which can hide cuts. It is only much
+    # faster for videos with a seek index and steps longer than their keyframe interval
+    cuts = load_scene_cuts(video_path, step)
+    if cuts is not None:
+        return cuts
+    
+    scored = scene_scores(video_path, step, cancel_event, progress)
+    if scored is None:
+        return None
+    frame_indices, scores = scored
+    cuts = []
+    positions = scene_cuts(frame_indices, scores)
+    if positions:
+        cap = cv2.VideoCapture(video_path)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        size = (SCENE_WIDTH, max(1, round(SCENE_WIDTH * height / max(1, width))))
+        try:
+            for i in positions:
+                start, end = int(frame_indices[i]), int(frame_indices[i + 1])
+                # Sampling skipped the frames in between, so find the exact cut among them
+                cuts.append(refine_cut(cap, start, end, size) if end - start > 1 else end)
+        finally:
+            cap.release()
+    
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(cache_file(video_path, f"scenes-{step}.json"), 'w') as f:
+        json.dump({'cuts': cuts}, f)
+    return cuts
+
+def scene_ranges(cuts, total_frames):
+    # (start, end) frame pairs of the scenes between cuts
+    bounds = [0] + [cut for cut in cuts if 0 < cut < total_frames] + [total_frames]
+    return [(a, b - 1) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+def sample_frame_indices(start_frame, end_frame, count, keyframes=None):
+    # Up to count frames spread over the range. Keyframes are preferred when the range holds
+    # at least half that many, since each one then costs a single decode instead of a decode run
+    if keyframes:
+        candidates = keyframes[bisect_left(keyframes, start_frame):bisect_right(keyframes, end_frame)]
+        if len(candidates) >= count // 2:
+            picks = np.linspace(0, len(candidates) - 1, min(count, len(candidates))).round().astype(int)
+            return sorted({candidates[i] for i in picks})
+    return sorted(set(np.linspace(start_frame, end_frame, count).round().astype(int).tolist()))
+
+def content_span(activity, threshold):
+    # First and one-past-last position above threshold, or the full span if none is
+    inside = np.flatnonzero(activity > threshold)
+    if len(inside) == 0:
+        return 0, len(activity)
+    return int(inside[0]), int(inside[-1]) + 1
+
+def detect_content_rect(frames):
+    # Largest rectangle of a [K, H, W] luma stack that isn't black bars or a static border.
+    # Returns (x1, y1, x2, y2) in stack pixels
+    stack = frames.astype(np.float32)
+    temporal = stack.std(axis=0)
+    row_activity = temporal.mean(axis=1)
+    col_activity = temporal.mean(axis=0)
+    height, width = temporal.shape
+    center = temporal[height // 4:height - height // 4, width // 4:width - width // 4]
+    motion = float(np.median(center))
+    if motion > 1.0:
+        # Borders are whatever changes much less than the middle of the picture
+        threshold = AUTO_CROP_ACTIVITY * motion
+        y1, y2 = content_span(row_activity, threshold)
+        x1, x2 = content_span(col_activity, threshold)
+    else:
+        # Nothing moves, so only flat bars can be told apart from the picture
+        y1, y2 = content_span(stack.std(axis=2).max(axis=0), AUTO_CROP_FLATNESS)
+        x1, x2 = content_span(stack.std(axis=1).max(axis=0), AUTO_CROP_FLATNESS)
+    return x1, y1, x2, y2
+
+def fit_aspect(rect, aspect):
+    # Shrink rect around its center to width / height == aspect
+    x1, y1, x2, y2 = rect
+    width, height = x2 - x1, y2 - y1
+    if width > height * aspect:
+        new_width, new_height = height * aspect, height
+    else:
+        new_width, new_height = width, width / aspect
+    cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+    return (int(math.ceil(cx - new_width / 2)), int(math.ceil(cy - new_height / 2)),
+            int(cx + new_width / 2), int(cy + new_height / 2))
+
+def auto_crop(video_path, start_frame, end_frame, keyframes=None, samples=AUTO_CROP_SAMPLES, proxy_path=None):
+    # Crop rectangle (x1, y1, x2, y2) in video pixels that removes black bars and static borders,
+    # judged from a few sampled frames. A proxy, when given, is sampled instead of the source as it
+    # is already small and seeks to any frame cheaply. Edges are rounded inwards
+    info = probe_video(video_path)
+    width, height = info['width'], info['height']
+    if proxy_path is not None:
+        cap = cv2.VideoCapture(proxy_path)
+        keyframes = None
+    else:
+        cap = cv2.VideoCapture(video_path)
+    sample_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    sample_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    scale = min(1.0, AUTO_CROP_WIDTH / sample_width)
+    size = (max(1, round(sample_width * scale)), max(1, round(sample_height * scale)))
+    
+    frame_indices = sample_frame_indices(start_frame, end_frame, samples, keyframes)
+    frames = np.empty((len(frame_indices), size[1], size[0]), dtype=np.uint8)
+    count = 0
+    try:
+        for _, frame in read_frames(cap, frame_indices, keyframes=keyframes):
+            if scale < 1.0:
+                frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            frames[count] = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            count += 1
+    finally:
+        cap.release()
+    if count == 0:
+        raise IOError(f"Cannot read frames of {video_path}")
+    
+    x1, y1, x2, y2 = detect_content_rect(frames[:count])
+    scale_x, scale_y = width / size[0], height / size[1]
+    return (min(width, int(math.ceil(x1 * scale_x))), min(height, int(math.ceil(y1 * scale_y))),
+            min(width, int(x2 * scale_x)), min(height, int(y2 * scale_y)))
+
+class DisplayRenderer:
+    # Letterboxes display frames into a preallocated buffer shown through one
+    # persistent PIL image, PhotoImage and canvas image item. Without a canvas only
+    # the buffer and PIL image are kept (for benchmarks)
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.key = None
+        self.buffer = None
+        self.image = None
+        self.photo = None
+        self.image_item = None
+        self.scale = 1.0
+        self.x_offset = 0
+        self.y_offset = 0
+        self.frame_width = 0
+        self.frame_height = 0
+    
+    def configure(self, video_width, video_height, display_width, display_height):
+        # Scale, offsets and buffers only change with the video or canvas size
+        key = (video_width, video_height, display_width, display_height)
+        if key == self.key:
+            return
+        self.key = key
+        
+        # Calculate aspect ratio and scaling factors
+        video_aspect = video_width / video_height
+        display_aspect = display_width / display_height
+        
+        if video_aspect > display_aspect:
+            # Video is wider than display
+            self.scale = display_width / video_width
+            self.frame_width = display_width
+            self.frame_height = int(video_height * self.scale)
+        else:
+            # Video is taller than display
+            self.scale = display_height / video_height
+            self.frame_width = int(video_width * self.scale)
+            self.frame_height = display_height
+        
+        # Calculate offsets for centering
+        self.x_offset = (display_width - self.frame_width) // 2
+        self.y_offset = (display_height - self.frame_height) // 2
+        
+        # Black letterbox background, reused for every frame
+        self.buffer = np.zeros((display_height, display_width, 3), dtype=np.uint8)
+        self.image = Image.new('RGB', (display_width, display_height))
+        if self.canvas is None:
+            return
+        self.photo = ImageTk.PhotoImage('RGB', (display_width, display_height))
+        if self.image_item is None:
+            self.image_item = self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo)
+        else:
+            self.canvas.itemconfig(self.image_item, image=self.photo)
+    
+    def render(self, frame_resized):
+        # Letterbox a display frame into the persistent PIL image
+        if frame_resized.shape[:2] != (self.frame_height, self.frame_width):
+            # Frame decoded for another geometry (e.g. before the canvas changed)
+            frame_resized = cv2.resize(frame_resized, (self.frame_width, self.frame_height))
+        self.buffer[self.y_offset:self.y_offset + self.frame_height,
+                    self.x_offset:self.x_offset + self.frame_width] = frame_resized
+        # Refill the persistent image from the buffer instead of wrapping it in a new one
+        self.image.frombytes(self.buffer)
+        return self.image
+    
+    def draw(self, frame_resized):
+        self.photo.paste(self.render(frame_resized))
+
+class ReadAheadDecoder:
+    # Decodes frames ahead of playback on its own capture and queues them at display size.
+    # With a PlaybackClock, frames whose time has already passed are skipped (grabbed or seeked
+    # over) instead of decoded, so slow decoding drops frames rather than slowing playback down
+    def __init__(self, video_path, start_frame, end_frame, display_size, keyframes=None,
+                 seek_threshold=SEEK_THRESHOLD, max_queued=32, clock=None):
+        self.video_path = video_path
+        self.clock = clock
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.display_size = display_size
+        self.keyframes = keyframes
+        self.seek_threshold = seek_threshold
+        self.frames = queue.Queue(maxsize=max_queued)
+        self.stop_event = Event()
+        self.thread = Thread(target=self.run, daemon=True)
+    
+    def start(self):
+        self.thread.start()
+        return self
+    
+    def run(self):
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            frame_idx = self.start_frame
+            position = None
+            while frame_idx <= self.end_frame:
+                if self.clock is not None:
+                    due = min(self.end_frame, self.clock.due_frame(time.monotonic()))
+                    if due > frame_idx:
+                        self.clock.add_dropped(due - frame_idx)
+                        frame_idx = due
+                frame = None
+                for _, frame in read_frames(cap, [frame_idx], self.seek_threshold, self.keyframes, position):
+                    pass
+                if frame is None:
+                    break
+                position = frame_idx + 1
+                if not self.put((frame_idx, to_display_frame(frame, self.display_size))):
+                    return
+                frame_idx += 1
+        finally:
+            cap.release()
+        # End of stream
+        self.put(None)
+    
+    def put(self, item):
+        # Block while the queue is full, but give up as soon as we're stopped
+        while not self.stop_event.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def get_nowait(self):
+        # Next (frame_idx, display_frame) or None at the end of the stream; raises queue.Empty
+        return self.frames.get_nowait()
+    
+    def stop(self):
+        self.stop_event.set()
+        # Drain the queue so a blocked producer notices the stop right away
+        while True:
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                break
+
+class PlaybackClock:
+    # Maps frame numbers to deadlines on the monotonic clock and keeps playback statistics
+    def __init__(self, fps, start_frame):
+        self.frame_interval = 1.0 / fps if fps > 0 else 1.0 / 30
+        self.shown = 0
+        # Counted by the UI and by the read-ahead decoder's thread
+        self.dropped = 0
+        self.lock = Lock()
+        self.first_shown_time = None
+        self.last_shown_time = None
+        self.intervals = []
+        self.restart(start_frame)
+    
+    def restart(self, start_frame):
+        # Anchor the schedule at start_frame (after a seek or resume), keeping the statistics
+        self.start_frame = start_frame
+        self.start_time = time.monotonic()
+        self.last_shown_time = None
+    
+    def deadline(self, frame_num):
+        return self.start_time + (frame_num - self.start_frame) * self.frame_interval
+    
+    def due_frame(self, now):
+        return self.start_frame + int((now - self.start_time) / self.frame_interval)
+    
+    def add_dropped(self, count):
+        with self.lock:
+            self.dropped += count
+    
+    def record_shown(self, now):
+        if self.first_shown_time is None:
+            self.first_shown_time = now
+        if self.last_shown_time is not None:
+            self.intervals.append(now - self.last_shown_time)
+            # Only the recent past matters for jitter
+            if len(self.intervals) > 240:
+                del self.intervals[:120]
+        self.last_shown_time = now
+        self.shown += 1
+    
+    def measured_fps(self):
+        if self.first_shown_time is None or self.shown < 2:
+            return 0.0
+        elapsed = time.monotonic() - self.first_shown_time
+        return (self.shown - 1) / elapsed if elapsed > 0 else 0.0
+    
+    def jitter_ms(self):
+        # Standard deviation of the time between shown frames
+        if len(self.intervals) < 2:
+            return 0.0
+        return float(np.std(self.intervals)) * 1000
+    
+    def stats_text(self):
+        return (f"Playback: {self.measured_fps():.1f} fps (target {1.0 / self.frame_interval:.1f}), "
+                f"{self.dropped} dropped, jitter {self.jitter_ms():.1f} ms")
+
+class FrameCache:
+    # LRU cache of display-resolution frames keyed by frame number, bounded by a memory budget
+    def __init__(self, max_mb=256):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.frames = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+    
+    def get(self, frame_num):
+        with self.lock:
+            frame = self.frames.get(frame_num)
+            if frame is None:
+                self.misses += 1
+                return None
+            self.frames.move_to_end(frame_num)
+            self.hits += 1
+            return frame
+    
+    def put(self, frame_num, frame):
+        with self.lock:
+            old = self.frames.pop(frame_num, None)
+            if old is not None:
+                self.size_bytes -= old.nbytes
+            self.frames[frame_num] = frame
+            self.size_bytes += frame.nbytes
+            self.evict()
+    
+    def evict(self):
+        # Drop least recently used frames until we're back within budget
+        while self.frames and self.size_bytes > self.max_bytes:
+            _, frame = self.frames.popitem(last=False)
+            self.size_bytes -= frame.nbytes
+    
+    def set_budget(self, max_mb):
+        with self.lock:
+            self.max_bytes = int(max_mb * 1024 * 1024)
+            self.evict()
+    
+    def clear(self):
+        with self.lock:
+            self.frames.clear()
+            self.size_bytes = 0
+            self.hits = 0
+            self.misses = 0
+    
+    def stats_text(self):
+        return (f"Cache: {self.hits} hits / {self.misses} misses, "
+                f"{self.size_bytes / (1024 * 1024):.0f}/{self.max_bytes / (1024 * 1024):.0f} MB")
+
+def null_stage(name):
+    return nullcontext()
+
+class StageTimer:
+    # Cumulative time, call count and worst single call per named stage. Thread-safe, so the
+    # decoder, resize workers and encoder of a pipelined export can share one timer
+    def __init__(self):
+        self.stages = {}
+        self.lock = Lock()
+    
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+    
+    def add(self, name, seconds, calls=1, max_seconds=None):
+        with self.lock:
+            total, count, worst = self.stages.get(name, (0.0, 0, 0.0))
+            self.stages[name] = (total + seconds, count + calls,
+                                 max(worst, seconds if max_seconds is None else max_seconds))
+    
+    def merge(self, snapshot):
+        # Fold in the snapshot() of a timer that ran elsewhere, e.g. in a chunk worker process
+        for name, stats in snapshot.items():
+            self.add(name, stats['seconds'], stats['calls'], stats['max_ms'] / 1000)
+    
+    def snapshot(self):
+        with self.lock:
+            return {name: {'calls': count, 'seconds': total,
+                           'mean_ms': 1000 * total / count if count else 0.0, 'max_ms': 1000 * worst}
+                    for name, (total, count, worst) in self.stages.items()}
+    
+    def clear(self):
+        with self.lock:
+            self.stages.clear()
+    
+    def stats_text(self, names=None):
+        # Mean and worst latency of the given stages, slowest first
+        snapshot = self.snapshot()
+        names = [n for n in (names or snapshot) if n in snapshot]
+        names.sort(key=lambda n: snapshot[n]['seconds'], reverse=True)
+        return ", ".join(f"{n} {snapshot[n]['mean_ms']:.1f}/{snapshot[n]['max_ms']:.0f} ms" for n in names)
+
+class ProgressThrottle:
+    # Lets a progress update through at most once per interval, plus the final one
+    def __init__(self, interval=PROGRESS_INTERVAL):
+        self.interval = interval
+        self.last = None
+    
+    def ready(self, done, total):
+        now = time.perf_counter()
+        if done >= total or self.last is None or now - self.last >= self.interval:
+            self.last = now
+            return True
+        return False
+
+class ExportCancelled(Exception):
+    pass
+
+def check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise ExportCancelled()
+
+@dataclass(frozen=True)
+class ExportJob:
+    # Everything needed to export one clip, independent of the GUI
+    input_path: str
+    output_path: str
+    crop: tuple
+    start_frame: int = 0
+    end_frame: int = None
+    rescale: bool = False
+    target_width: int = 512
+    target_height: int = 512
+    drop_frames: bool = False
+    target_frames: int = 100
+    pad_last_frame: bool = False
+    output_fps: float = 30.0
+    # OpenCV worker threads used by this job (0 keeps OpenCV's default)
+    threads: int = 0
+    # Split the clip into this many segments encoded by separate processes
+    chunks: int = 1
+    # Crop/resize worker threads between the decoder and encoder threads
+    workers: int = 1
+    # Encoder backend ('opencv' or 'ffmpeg') and the ffmpeg backend's settings
+    encoder: str = 'opencv'
+    codec: str = 'libx264'
+    crf: int = 18
+    preset: str = 'medium'
+    pix_fmt: str = 'yuv420p'
+    encoder_threads: int = 0
+    # Pure temporal trims copy packets instead of re-encoding, re-encoding only
+    # the frames before the first keyframe (smart cut) where the codec allows it
+    fast_trim: bool = True
+    # Otherwise start the copy at the keyframe before start_frame, exporting a few extra frames
+    allow_keyframe_snap: bool = False
+    # 'mp4', 'npy' (uint8 array of shape [T, H, W, 3]) or a 'png'/'jpg' image sequence directory
+    output_format: str = 'mp4'
+    jpeg_quality: int = 95
+    # Write per-stage timings to <output>.report.json
+    write_report: bool = False
+    # Encode MP4 exports as checkpointed segments of this many frames that an interrupted
+    # run picks up again (0 writes the output directly)
+    checkpoint_frames: int = 0
+    # Filter of the final resize (see INTERPOLATIONS)
+    interpolation: str = 'lanczos'
+    # 'stretch' scales the crop to the target size, 'center' scales the largest centered part
+    # of it with the target's aspect ratio
+    fit: str = 'stretch'
+    # Halve the crop with INTER_AREA while it stays at least twice the target size before the
+    # final resize. Outputs of a shared decode with the same crop share these halvings
+    prescale: bool = False
+    
+    @classmethod
+    def from_dict(cls, data):
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Unknown job keys: {', '.join(sorted(unknown))}")
+        data = dict(data)
+        data['crop'] = tuple(data['crop'])
+        return cls(**data)
+    
+    def to_dict(self):
+        data = asdict(self)
+        data['crop'] = list(self.crop)
+        return data
+    
+    def output_size(self):
+        x1, y1, x2, y2 = self.crop
+        if self.rescale:
+            return self.target_width, self.target_height
+        return int(x2 - x1), int(y2 - y1)
+
+def export_frame_indices(start_frame, end_frame, drop_frames=False, target_frames=100):
+    total_input_frames = end_frame - start_frame + 1
+    if drop_frames:
+        # Calculate step size for uniform sampling
+        step = max(1, total_input_frames / target_frames)
+        frame_indices = [start_frame + int(i * step) for i in range(target_frames)]
+        frame_indices[-1] = min(frame_indices[-1], end_frame)  # Ensure last frame doesn't exceed
+        return frame_indices
+    # Process all frames
+    return list(range(start_frame, end_frame + 1))
+
+def prescale_levels(width, height, job):
+    # How many times a width x height crop can be halved and still be twice the target size
+    levels = 0
+    while min((width // 2) / job.target_width, (height // 2) / job.target_height) >= 2:
+        width, height = width // 2, height // 2
+        levels += 1
+    return levels
+
+def halve(image):
+    height, width = image.shape[:2]
+    return cv2.resize(image, (width // 2, height // 2), interpolation=cv2.INTER_AREA)
+
+def crop_pyramid(frame, crop, levels):
+    # The crop of frame followed by its successive halvings, levels + 1 images in all
+    x1, y1, x2, y2 = crop
+    pyramid = [frame[int(y1):int(y2), int(x1):int(x2)]]
+    for _ in range(levels):
+        pyramid.append(halve(pyramid[-1]))
+    return pyramid
+
+def resize_to_target(image, job):
+    # The final resize of an already cropped (and maybe prescaled) frame
+    if job.fit == 'center':
+        height, width = image.shape[:2]
+        x1, y1, x2, y2 = fit_aspect((0, 0, width, height), job.target_width / job.target_height)
+        image = image[y1:y2, x1:x2]
+    return cv2.resize(
+        image,
+        (job.target_width, job.target_height),
+        interpolation=INTERPOLATIONS[job.interpolation]
+    )
+
+def transform_frame(frame, job):
+    # Crop frame
+    x1, y1, x2, y2 = job.crop
+    cropped_frame = frame[int(y1):int(y2), int(x1):int(x2)]
+    
+    # Rescale if needed
+    if job.rescale:
+        if job.prescale:
+            for _ in range(prescale_levels(int(x2) - int(x1), int(y2) - int(y1), job)):
+                cropped_frame = halve(cropped_frame)
+        cropped_frame = resize_to_target(cropped_frame, job)
+    return cropped_frame
+
+def parse_buckets(text):
+    # "512x512, 768x432:area" -> [(512, 512, None), (768, 432, 'area')]
+    buckets = []
+    for item in text.replace(';', ',').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        size, _, interpolation = item.partition(':')
+        width, _, height = size.lower().partition('x')
+        try:
+            width, height = int(width), int(height)
+        except ValueError:
+            raise ValueError(f"Bad bucket size: {item}")
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Bad bucket size: {item}")
+        interpolation = interpolation.strip().lower() or None
+        if interpolation is not None and interpolation not in INTERPOLATIONS:
+            raise ValueError(f"Unknown interpolation: {interpolation}")
+        buckets.append((width, height, interpolation))
+    return buckets
+
+def bucket_output_path(output_path, width, height):
+    # clip.mp4 -> clip_512x512.mp4 (and image sequence directories the same way)
+    root, ext = os.path.splitext(output_path)
+    return f"{root}_{width}x{height}{ext}"
+
+def bucket_jobs(job, buckets):
+    # One prescaled center-crop job per (width, height, interpolation) bucket, so a shared
+    # decode exports all of them from one pass over the video
+    return [replace(job, output_path=bucket_output_path(job.output_path, width, height), rescale=True,
+                    target_width=width, target_height=height, fit='center', prescale=True,
+                    interpolation=interpolation or job.interpolation)
+            for width, height, interpolation in buckets]
+
+def probe_video(path):
+    # Basic stream properties as reported by OpenCV
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open {path}")
+    info = {
+        'frame_count': int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        'fps': cap.get(cv2.CAP_PROP_FPS),
+        'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+    }
+    cap.release()
+    return info
+
+def plan_export(job, keyframes=None, total_frames=None):
+    # Probe the source and work out which frames the job exports. total_frames, when given,
+    # is the frame count that came with keyframes. Returns (frame_indices, keyframes, source info)
+    info = probe_video(job.input_path)
+    if total_frames is None:
+        total_frames = info['frame_count']
+    
+    if keyframes is None:
+        # Use the GUI's seek index if it has already been built for this file
+        index = SeekIndex.load(job.input_path)
+        if index is not None:
+            total_frames = index.frame_count
+            keyframes = index.keyframes
+    
+    start_frame = job.start_frame
+    end_frame = total_frames - 1 if job.end_frame is None else min(job.end_frame, total_frames - 1)
+    if start_frame < 0 or start_frame > end_frame:
+        raise ValueError("Invalid start/end frame values!")
+    
+    frame_indices = export_frame_indices(start_frame, end_frame, job.drop_frames, job.target_frames)
+    return frame_indices, keyframes, info
+
+# MPEG-4 Part 2 keeps its stream header in a few bytes that can be resent in band,
+# which lets OpenCV splice re-encoded and copied packets of these codecs
+MPEG4_FOURCCS = {'FMP4', 'mp4v', 'MP4V', 'XVID', 'xvid', 'DIVX', 'divx', 'DX50'}
+
+def is_pure_trim(job, info):
+    # Whole frame, native size and rate, every frame: the output is just a slice of the source
+    x1, y1, x2, y2 = job.crop
+    return (int(x1) <= 0 and int(y1) <= 0 and int(x2) >= info['width'] and int(y2) >= info['height']
+            and not job.rescale and not job.drop_frames and not job.pad_last_frame
+            and abs(job.output_fps - info['fps']) < 1e-3)
+
+def open_packet_reader(path):
+    # Capture returning encoded packets. Returns (cap, stream header or None, fourcc string)
+    cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+    if not cap.isOpened():
+        raise IOError(f"Cannot open {path}")
+    fourcc = int(cap.get(cv2.CAP_PROP_FOURCC)).to_bytes(4, 'little').decode('latin-1')
+    ret, header = cap.retrieve(flag=int(cap.get(cv2.CAP_PROP_CODEC_EXTRADATA_INDEX)))
+    if not ret or header is None or header.size == 0:
+        header = None
+    return cap, header, fourcc
+
+def smart_trim_mp4v(job, start_frame, end_frame, keyframes, info):
+    # Copy the source packets from the first keyframe at or after start_frame and re-encode only
+    # the frames before it. Returns the exported frame count, or None when the source can't be spliced
+    cap, source_header, fourcc = open_packet_reader(job.input_path)
+    try:
+        # Reordered (B-frame) streams can't be cut by packet index
+        if fourcc not in MPEG4_FOURCCS or source_header is None or cap.get(cv2.CAP_PROP_DTS_DELAY) > 0:
+            return None
+        first_copied = keyframes[bisect_left(keyframes, start_frame)] if keyframes[-1] >= start_frame else None
+        if first_copied is None or first_copied > end_frame:
+            return None
+        
+        size = (info['width'], info['height'])
+        out = cv2.VideoWriter(job.output_path, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*'mp4v'), info['fps'], size,
+                              [cv2.VIDEOWRITER_PROP_RAW_VIDEO, 1])
+        if not out.isOpened():
+            return None
+        
+        count = 0
+        try:
+            if first_copied > start_frame:
+                # Re-encode the head, then splice its packets in front of the copied ones
+                head_path = job.output_path + '.head.mp4'
+                head_job = replace(job, encoder='opencv')
+                try:
+                    encode_frames(head_job, list(range(start_frame, first_copied)), head_path)
+                    head_cap, head_header, _ = open_packet_reader(head_path)
+                    while head_cap.grab():
+                        ret, packet = head_cap.retrieve()
+                        if head_header is not None:
+                            packet = np.concatenate([head_header.reshape(1, -1), packet.reshape(1, -1)], axis=1)
+                            head_header = None
+                        out.write(packet)
+                        count += 1
+                    head_cap.release()
+                finally:
+                    if os.path.exists(head_path):
+                        os.remove(head_path)
+            
+            # The source header goes in band before the first copied keyframe
+            packet_idx = 0
+            while packet_idx <= end_frame and cap.grab():
+                if packet_idx >= first_copied:
+                    ret, packet = cap.retrieve()
+                    if packet_idx == first_copied:
+                        packet = np.concatenate([source_header.reshape(1, -1), packet.reshape(1, -1)], axis=1)
+                    out.write(packet)
+                    count += 1
+                packet_idx += 1
+        finally:
+            out.release()
+        return count
+    finally:
+        cap.release()
+
+def snap_trim_ffmpeg(job, start_frame, end_frame, keyframes, info):
+    # Let ffmpeg copy packets from the keyframe at or before start_frame. Returns (first frame, frame count)
+    keyframe = keyframes[max(0, bisect_right(keyframes, start_frame) - 1)]
+    fps = info['fps']
+    result = subprocess.run([find_ffmpeg(), '-y', '-loglevel', 'error',
+                             '-ss', f"{keyframe / fps:.6f}", '-i', job.input_path,
+                             '-t', f"{(end_frame - keyframe + 1) / fps:.6f}",
+                             '-map', '0:v:0', '-c', 'copy', '-avoid_negative_ts', 'make_zero',
+                             job.output_path], capture_output=True)
+    if result.returncode != 0:
+        raise IOError(f"ffmpeg trim failed: {result.stderr.decode('utf-8', 'replace').strip()[-500:]}")
+    
+    # Count what was actually written rather than trusting the timestamps
+    index = SeekIndex.build(job.output_path)
+    return keyframe, index.frame_count if index is not None else 0
+
+# Per source codec: the ffmpeg encoder matching it, the option making it repeat the parameter sets before
+# every keyframe, and the bitstream filter doing the same for copied packets. With the parameter sets in
+# band, re-encoded and copied segments still decode after ffmpeg joins them
+SMART_CUT_CODECS = {
+    'h264': ('libx264', ['-x264-params', 'repeat-headers=1'], 'h264_mp4toannexb'),
+    'hevc': ('libx265', ['-x265-params', 'repeat-headers=1'], 'hevc_mp4toannexb'),
+}
+
+def probe_video_stream(path):
+    # (codec, pixel format) of the first video stream as ffmpeg reports it, or None
+    result = subprocess.run([find_ffmpeg(), '-hide_banner', '-i', path], capture_output=True)
+    match = re.search(r"Stream #\d+:\d+.*?: Video: (\w+)[^,]*, (\w+)", result.stderr.decode('utf-8', 'replace'))
+    return match.groups() if match else None
+
+def packet_timestamps(path):
+    # (pts, duration) of the video packets of path in decode order, as listed by ffmpeg's framecrc muxer
+    result = subprocess.run([find_ffmpeg(), '-loglevel', 'error', '-i', path, '-map', '0:v:0', '-c', 'copy',
+                             '-f', 'framecrc', '-'], capture_output=True)
+    if result.returncode != 0:
+        raise IOError(f"ffmpeg failed: {result.stderr.decode('utf-8', 'replace').strip()[-500:]}")
+    rows = [line.split(',') for line in result.stdout.decode('utf-8', 'replace').splitlines()
+            if line and not line.startswith('#')]
+    return [(int(row[2]), int(row[3])) for row in rows]
+
+def smart_trim_ffmpeg(job, start_frame, end_frame, keyframes, info):
+    # smart_trim_mp4v for H.264/HEVC: copy the whole GOPs inside the range and re-encode the frames before
+    # and after them with the source codec. Returns (exported frame count, re-encoded frame count),
+    # or None when the source can't be spliced
+    stream = probe_video_stream(job.input_path)
+    if stream is None or stream[0] not in SMART_CUT_CODECS:
+        return None
+    encoder, repeat_headers, annexb_filter = SMART_CUT_CODECS[stream[0]]
+    first_copied = keyframes[bisect_left(keyframes, start_frame)] if keyframes[-1] >= start_frame else None
+    if end_frame + 1 >= info['frame_count'] or end_frame + 1 in keyframes:
+        copy_end = end_frame + 1
+    else:
+        copy_end = keyframes[bisect_right(keyframes, end_frame) - 1]
+    if first_copied is None or copy_end <= first_copied:
+        return None
+    
+    fps = info['fps']
+    size = (info['width'], info['height'])
+    part_job = replace(job, encoder='ffmpeg', codec=encoder, pix_fmt=stream[1])
+    
+    def encode_part(frame_indices, path):
+        out = FFmpegEncoder(path, fps, size, part_job, extra_args=repeat_headers)
+        cap = cv2.VideoCapture(job.input_path)
+        try:
+            for _, frame in read_frames(cap, frame_indices, keyframes=keyframes):
+                out.write(frame)
+        finally:
+            cap.release()
+            out.release()
+    
+    head_path, copy_path, tail_path = (f"{job.output_path}.{part}.mp4" for part in ('head', 'copy', 'tail'))
+    try:
+        # Whole GOPs hold the same frames in decode and display order, so counting packets cuts them exactly
+        result = subprocess.run([find_ffmpeg(), '-y', '-loglevel', 'error',
+                                 '-ss', f"{first_copied / fps:.6f}", '-i', job.input_path,
+                                 '-map', '0:v:0', '-c', 'copy', '-bsf:v', annexb_filter,
+                                 '-frames:v', str(copy_end - first_copied), copy_path], capture_output=True)
+        if result.returncode != 0:
+            raise IOError(f"ffmpeg trim failed: {result.stderr.decode('utf-8', 'replace').strip()[-500:]}")
+        
+        # Open GOPs show frames from before their keyframe, so the copied ones must be consecutive from it
+        timestamps = packet_timestamps(copy_path)
+        pts = sorted(timestamp for timestamp, _ in timestamps)
+        if (len(pts) != copy_end - first_copied or pts[0] != timestamps[0][0]
+                or any(b - a != timestamps[0][1] for a, b in zip(pts, pts[1:]))):
+            return None
+        
+        segment_paths = [copy_path]
+        if first_copied > start_frame:
+            encode_part(list(range(start_frame, first_copied)), head_path)
+            segment_paths.insert(0, head_path)
+        if copy_end <= end_frame:
+            encode_part(list(range(copy_end, end_frame + 1)), tail_path)
+            segment_paths.append(tail_path)
+        concat_with_ffmpeg(segment_paths, job.output_path)
+    except (IOError, ValueError):
+        # E.g. an ffmpeg build without the encoder: leave it to the other trims or a re-encode
+        if os.path.exists(job.output_path):
+            os.remove(job.output_path)
+        return None
+    finally:
+        for path in (head_path, copy_path, tail_path):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    # Count what was actually written rather than trusting the timestamps
+    index = SeekIndex.build(job.output_path)
+    return (index.frame_count if index is not None else 0), (first_copied - start_frame) + (end_frame + 1 - copy_end)
+
+def trim_without_reencode(job, start_frame, end_frame, keyframes, info):
+    # Returns (method, first frame, frame count), or None to fall back to re-encoding
+    if not keyframes:
+        index = SeekIndex.load_or_build(job.input_path)
+        keyframes = index.keyframes if index is not None else None
+    if not keyframes:
+        return None
+    
+    count = smart_trim_mp4v(job, start_frame, end_frame, keyframes, info)
+    if count is not None:
+        return ('copy' if start_frame in keyframes else 'smart'), start_frame, count
+    
+    if find_ffmpeg() is None:
+        return None
+    trimmed = smart_trim_ffmpeg(job, start_frame, end_frame, keyframes, info)
+    if trimmed is not None:
+        count, reencoded = trimmed
+        return ('smart' if reencoded else 'copy'), start_frame, count
+    if start_frame in keyframes or job.allow_keyframe_snap:
+        first_frame, count = snap_trim_ffmpeg(job, start_frame, end_frame, keyframes, info)
+        return ('copy' if first_frame == start_frame else 'snap'), first_frame, count
+    return None
+
+def pipelined_transform(frames, job, workers, max_queued=None, transform=transform_frame):
+    # Decode on a separate thread, crop/resize on a pool of workers and yield the results in
+    # input order. The bounded queue of pending results caps how many frames are in memory
+    pending = queue.Queue(maxsize=max_queued or 2 * workers)
+    stop_event = Event()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    
+    def put(item):
+        while not stop_event.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def decode():
+        try:
+            for _, frame in frames:
+                if not put(executor.submit(transform, frame, job)):
+                    return
+        except Exception as e:
+            put(e)
+        # End of stream
+        put(None)
+    
+    decoder = Thread(target=decode, daemon=True)
+    decoder.start()
+    try:
+        while True:
+            item = pending.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            # Futures are queued in decode order, so waiting on them in turn keeps the output ordered
+            yield item.result()
+    finally:
+        stop_event.set()
+        decoder.join()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def find_ffmpeg():
+    # ffmpeg executable from $FFMPEG_BINARY or the PATH, or None
+    return os.environ.get('FFMPEG_BINARY') or shutil.which('ffmpeg')
+
+class OpenCVEncoder:
+    # Default backend: cv2.VideoWriter with the mp4v fourcc
+    name = 'opencv'
+    
+    def __init__(self, output_path, fps, size, job):
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        self.writer = cv2.VideoWriter(output_path, fourcc, fps, size)
+        if not self.writer.isOpened():
+            raise IOError(f"Cannot open {output_path} for writing")
+    
+    def write(self, frame):
+        self.writer.write(frame)
+    
+    def release(self):
+        self.writer.release()
+
+class FFmpegEncoder:
+    # Streams raw BGR frames over stdin to a local ffmpeg process
+    name = 'ffmpeg'
+    
+    def __init__(self, output_path, fps, size, job, extra_args=()):
+        ffmpeg = find_ffmpeg()
+        if ffmpeg is None:
+            raise IOError("ffmpeg not found")
+        if job.pix_fmt.startswith(('yuv420', 'nv12')) and (size[0] % 2 or size[1] % 2):
+            raise ValueError(f"Pixel format {job.pix_fmt} needs an even width and height, got {size[0]}x{size[1]}")
+        command = [
+            ffmpeg, '-y', '-loglevel', 'error', '-nostats',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f"{size[0]}x{size[1]}", '-r', str(fps), '-i', '-',
+            '-c:v', job.codec, '-pix_fmt', job.pix_fmt,
+        ]
+        if job.codec in ('libx264', 'libx265'):
+            command += ['-crf', str(job.crf), '-preset', job.preset]
+        if job.encoder_threads:
+            command += ['-threads', str(job.encoder_threads)]
+        command += list(extra_args)
+        command.append(output_path)
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    
+    def write(self, frame):
+        try:
+            self.process.stdin.write(np.ascontiguousarray(frame).data)
+        except (BrokenPipeError, OSError):
+            # ffmpeg exited early; release() reports why
+            pass
+    
+    def release(self):
+        if self.process.stdin and not self.process.stdin.closed:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+        stderr = self.process.stderr.read().decode('utf-8', 'replace')
+        self.process.stderr.close()
+        if self.process.wait() != 0:
+            raise IOError(f"ffmpeg failed: {stderr.strip()[-500:]}")
+
+class NpyWriter:
+    # Writes RGB frames straight into a memory-mapped .npy file of shape [T, H, W, 3], so the clip
+    # never has to be held in RAM. T is sized up front and trimmed if fewer frames arrive
+    name = 'npy'
+    
+    def __init__(self, output_path, fps, size, job, expected_frames):
+        self.output_path = output_path
+        self.frames = np.lib.format.open_memmap(output_path, mode='w+', dtype=np.uint8,
+                                                shape=(max(1, expected_frames), size[1], size[0], 3))
+        self.count = 0
+    
+    def write(self, frame):
+        if self.count < len(self.frames):
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.frames[self.count])
+            self.count += 1
+    
+    def release(self):
+        expected, height, width, _ = self.frames.shape
+        offset = self.frames.offset
+        self.frames.flush()
+        del self.frames
+        if self.count == expected:
+            return
+        
+        # Shrink T in place: the header is padded, so the smaller shape always fits in it
+        with open(self.output_path, 'r+b') as f:
+            major = f.read(8)[6]
+            prefix = 10 if major == 1 else 12
+            header = repr({'descr': '|u1', 'fortran_order': False, 'shape': (self.count, height, width, 3)})
+            f.seek(prefix)
+            f.write(header.ljust(offset - prefix - 1).encode('latin-1') + b'\n')
+            f.truncate(offset + self.count * height * width * 3)
+
+class ImageSequenceWriter:
+    # Writes numbered PNG/JPEG frames into a directory from a thread pool
+    def __init__(self, output_path, fps, size, job, workers=4):
+        self.name = job.output_format
+        self.output_dir = output_path
+        os.makedirs(output_path, exist_ok=True)
+        # Frames of an earlier export into the same directory would mix with this one
+        for name in os.listdir(output_path):
+            if name.startswith('frame_') and name.endswith(('.png', '.jpg')):
+                os.remove(os.path.join(output_path, name))
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, job.jpeg_quality] if job.output_format == 'jpg' else []
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pending = []
+        self.max_pending = 2 * workers
+        self.count = 0
+    
+    def write(self, frame):
+        path = os.path.join(self.output_dir, f"frame_{self.count:06d}.{self.name}")
+        self.pending.append(self.executor.submit(self.save, path, frame))
+        self.count += 1
+        # Wait for the oldest frames so memory stays bounded
+        while len(self.pending) > self.max_pending:
+            self.pending.pop(0).result()
+    
+    def save(self, path, frame):
+        if not cv2.imwrite(path, frame, self.params):
+            raise IOError(f"Cannot write {path}")
+    
+    def release(self):
+        try:
+            for future in self.pending:
+                future.result()
+        finally:
+            self.executor.shutdown(wait=True)
+
+ENCODERS = {'opencv': OpenCVEncoder, 'ffmpeg': FFmpegEncoder}
+
+OUTPUT_FORMATS = ['mp4', 'npy', 'png', 'jpg']
+
+def available_encoders():
+    # Backends usable on this machine, default first
+    names = ['opencv']
+    if find_ffmpeg() is not None:
+        names.append('ffmpeg')
+    return names
+
+def resolve_encoder(name):
+    # Fall back to the OpenCV writer when the requested backend is missing
+    return name if name in available_encoders() else 'opencv'
+
+def open_video_writer(job, output_path, expected_frames=1):
+    if job.output_format == 'npy':
+        return NpyWriter(output_path, job.output_fps, job.output_size(), job, expected_frames)
+    if job.output_format in ('png', 'jpg'):
+        return ImageSequenceWriter(output_path, job.output_fps, job.output_size(), job, max(2, job.workers))
+    return ENCODERS[job.encoder](output_path, job.output_fps, job.output_size(), job)
+
+def encode_frames(job, frame_indices, output_path, keyframes=None, progress=None, pad_last_frame=False,
+                  timer=None, cancel_event=None):
+    # Decode, transform and encode frame_indices into output_path, stopping at the first unreadable frame.
+    # Returns (frames written excluding padding, whether every frame was read, last written frame)
+    stage = timer.stage if timer is not None else null_stage
+    
+    def transform(frame, job):
+        with stage('transform'):
+            return transform_frame(frame, job)
+    
+    with stage('open'):
+        cap = cv2.VideoCapture(job.input_path)
+        out = open_video_writer(job, output_path, len(frame_indices) + (1 if pad_last_frame else 0))
+    
+    processed_count = 0
+    cropped_frame = None
+    frames = read_frames(cap, frame_indices, keyframes=keyframes, timer=timer)
+    if job.workers > 1:
+        transformed = pipelined_transform(frames, job, job.workers, transform=transform)
+    else:
+        transformed = (transform(frame, job) for _, frame in frames)
+    try:
+        for cropped_frame in transformed:
+            check_cancelled(cancel_event)
+            # Write to output
+            with stage('encode'):
+                out.write(cropped_frame)
+            processed_count += 1
+            if progress is not None:
+                progress(processed_count, len(frame_indices))
+        
+        # Handle padding if needed
+        if pad_last_frame and cropped_frame is not None:
+            # Write the last frame one more time
+            with stage('encode'):
+                out.write(cropped_frame)
+    finally:
+        # Stop the decoder before its capture goes away
+        transformed.close()
+        cap.release()
+        with stage('finalize'):
+            out.release()
+    return processed_count, processed_count == len(frame_indices), cropped_frame
+
+def export_segment(job, frame_indices, segment_path, keyframes=None, return_last_frame=False, cancel_event=None):
+    # Chunk worker entry point, runs in its own process with its own VideoCapture.
+    # Returns the segment's stage timings too, to be merged into the parent's timer
+    if job.threads:
+        cv2.setNumThreads(job.threads)
+    timer = StageTimer()
+    count, complete, last_frame = encode_frames(job, frame_indices, segment_path, keyframes, timer=timer,
+                                                cancel_event=cancel_event)
+    return count, complete, last_frame if return_last_frame else None, timer.snapshot()
+
+def concat_with_ffmpeg(segment_paths, output_path):
+    # ffmpeg's concat demuxer copies packets of segments with identical codec settings
+    list_path = output_path + '.concat.txt'
+    with open(list_path, 'w') as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        result = subprocess.run([find_ffmpeg(), '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                                 '-i', list_path, '-c', 'copy', output_path], capture_output=True)
+    finally:
+        os.remove(list_path)
+    if result.returncode != 0:
+        raise IOError(f"ffmpeg concat failed: {result.stderr.decode('utf-8', 'replace').strip()[-500:]}")
+
+def concat_videos(segment_paths, output_path, fps, size, encoder='opencv'):
+    if encoder == 'ffmpeg':
+        concat_with_ffmpeg(segment_paths, output_path)
+    else:
+        concat_mp4v(segment_paths, output_path, fps, size)
+
+def concat_mp4v(segment_paths, output_path, fps, size):
+    # Losslessly join MP4 segments encoded with identical settings by copying their packets.
+    # Every segment starts with a keyframe, so its packets decode the same after the join
+    out = None
+    header = None
+    try:
+        for path in segment_paths:
+            cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+            if not cap.isOpened():
+                raise IOError(f"Cannot open segment {path}")
+            if out is None:
+                out = cv2.VideoWriter(output_path, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*'mp4v'), fps, size,
+                                      [cv2.VIDEOWRITER_PROP_RAW_VIDEO, 1])
+                if not out.isOpened():
+                    raise IOError("This OpenCV build can't write packets without re-encoding")
+                # MPEG-4 keeps its stream header out of band; send it in band ahead of the first packet
+                ret, header = cap.retrieve(flag=int(cap.get(cv2.CAP_PROP_CODEC_EXTRADATA_INDEX)))
+                if not ret or header is None or header.size == 0:
+                    header = None
+            while cap.grab():
+                ret, packet = cap.retrieve()
+                if not ret:
+                    break
+                if header is not None:
+                    packet = np.concatenate([header.reshape(1, -1), packet.reshape(1, -1)], axis=1)
+                    header = None
+                out.write(packet)
+            cap.release()
+    finally:
+        if out is not None:
+            out.release()
+
+# Job fields that don't change the exported frames, so checkpoints and finished builds
+# stay valid when only these change
+OUTPUT_NEUTRAL_FIELDS = ('threads', 'chunks', 'workers', 'write_report', 'checkpoint_frames')
+
+def job_key(job):
+    # Everything that determines a job's output, including the state of its source file
+    data = job.to_dict()
+    for name in OUTPUT_NEUTRAL_FIELDS:
+        data.pop(name)
+    return {'job': data, 'source': video_fingerprint(job.input_path)}
+
+def job_hash(job):
+    return hashlib.sha1(json.dumps(job_key(job), sort_keys=True).encode()).hexdigest()
+
+def load_checkpoint(job, chunk_dir, segment_paths):
+    # The manifest of an interrupted run of this job, minus segments whose files are gone.
+    # Leftovers of another job or of an edited source are discarded
+    # Segment boundaries depend on the checkpoint length too
+    key = dict(job_key(job), checkpoint_frames=job.checkpoint_frames)
+    try:
+        with open(os.path.join(chunk_dir, 'manifest.json'), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = None
+    if manifest is None or manifest.get('key') != key or manifest.get('segment_count') != len(segment_paths):
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+        return {'key': key, 'segment_count': len(segment_paths), 'segments': {}}
+    manifest['segments'] = {i: entry for i, entry in manifest['segments'].items()
+                            if os.path.exists(segment_paths[int(i)])}
+    return manifest
+
+def save_checkpoint(chunk_dir, manifest):
+    # Replace atomically, so a crash leaves either the old or the new manifest
+    path = os.path.join(chunk_dir, 'manifest.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(path + '.tmp', path)
+
+def export_chunked(job, frame_indices, keyframes=None, progress=None, timer=None, cancel_event=None):
+    # Encode contiguous slices of frame_indices as separate segments, then join them losslessly.
+    # Segments run in job.chunks processes, or in this one when chunks is 1. With
+    # job.checkpoint_frames they are that long and kept next to the output with a manifest
+    # until the join, so re-running an interrupted job only encodes the missing ones.
+    # Frame count and order match the sequential path, including its stop at the first unreadable
+    # frame and the padded last frame. Returns (frames written excluding padding, padded, how many
+    # of those came from segments of an earlier run)
+    stage = timer.stage if timer is not None else null_stage
+    resumable = job.checkpoint_frames > 0
+    chunk_dir = job.output_path + ('.parts' if resumable else '.chunks')
+    
+    if resumable:
+        bounds = list(range(0, len(frame_indices), job.checkpoint_frames)) + [len(frame_indices)]
+    else:
+        bounds = np.linspace(0, len(frame_indices), job.chunks + 1).astype(int)
+    segments = [(frame_indices[a:b], os.path.join(chunk_dir, f"segment-{i:04d}.mp4"))
+                for i, (a, b) in enumerate(zip(bounds[:-1], bounds[1:]))]
+    results = [None] * len(segments)
+    
+    manifest = None
+    reused = set()
+    if resumable:
+        manifest = load_checkpoint(job, chunk_dir, [path for _, path in segments])
+        for i, entry in manifest['segments'].items():
+            results[int(i)] = (entry['frames'], entry['complete'], None)
+            reused.add(int(i))
+    os.makedirs(chunk_dir, exist_ok=True)
+    
+    def finish_segment(i, count, complete, segment_last):
+        results[i] = (count, complete, segment_last)
+        if manifest is not None:
+            manifest['segments'][str(i)] = {'frames': count, 'complete': complete}
+            save_checkpoint(chunk_dir, manifest)
+    
+    # Segments after one that stopped early are never used
+    pending = []
+    for i, result in enumerate(results):
+        if result is not None and not result[1]:
+            break
+        if result is None:
+            pending.append(i)
+    done = sum(len(segments[i][0]) for i, result in enumerate(results) if result is not None)
+    
+    # Spawn rather than fork: the GUI calls this from a thread next to Tk
+    context = multiprocessing.get_context('spawn')
+    # Worker processes can't see a threading.Event, so cancellation is relayed through a manager
+    manager = context.Manager() if cancel_event is not None and job.chunks > 1 else None
+    segment_cancel = manager.Event() if manager is not None else None
+    try:
+        if job.chunks > 1:
+            with ProcessPoolExecutor(max_workers=job.chunks, mp_context=context) as executor:
+                futures = {executor.submit(export_segment, job, segments[i][0], segments[i][1], keyframes,
+                                           job.pad_last_frame, segment_cancel): i
+                           for i in pending}
+                running = set(futures)
+                while running:
+                    finished, running = wait(running, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+                    if cancel_event is not None and cancel_event.is_set():
+                        # Running segments stop at their next frame, queued ones never start
+                        segment_cancel.set()
+                        executor.shutdown(wait=True, cancel_futures=True)
+                        raise ExportCancelled()
+                    for future in finished:
+                        i = futures[future]
+                        count, complete, segment_last, stages = future.result()
+                        finish_segment(i, count, complete, segment_last)
+                        if timer is not None:
+                            timer.merge(stages)
+                        done += len(segments[i][0])
+                        if progress is not None:
+                            progress(done, len(frame_indices))
+        else:
+            for i in pending:
+                indices, path = segments[i]
+                segment_progress = None
+                if progress is not None:
+                    segment_progress = lambda count, total, offset=done: progress(offset + count, len(frame_indices))
+                count, complete, segment_last = encode_frames(job, indices, path, keyframes, segment_progress,
+                                                              timer=timer, cancel_event=cancel_event)
+                finish_segment(i, count, complete, segment_last)
+                done += len(indices)
+                if not complete:
+                    break
+        
+        # Keep segments up to the first one that stopped early, like the sequential loop's break
+        segment_paths = []
+        processed_count = 0
+        reused_count = 0
+        last_segment = None
+        for i, ((indices, path), (count, complete, segment_last)) in enumerate(zip(segments, results)):
+            if count > 0:
+                segment_paths.append(path)
+                processed_count += count
+                if i in reused:
+                    reused_count += count
+                last_segment = (indices[count - 1], segment_last)
+            if not complete:
+                break
+        
+        padded = job.pad_last_frame and last_segment is not None
+        if padded:
+            last_idx, last_frame = last_segment
+            if last_frame is None:
+                # Finished in an earlier run, so decode the last frame once more
+                cap = cv2.VideoCapture(job.input_path)
+                for _, frame in read_frames(cap, [last_idx], keyframes=keyframes):
+                    last_frame = transform_frame(frame, job)
+                cap.release()
+                if last_frame is None:
+                    raise IOError(f"Cannot read frame {last_idx} of {job.input_path}")
+            # The padding frame becomes a one-frame segment of its own
+            pad_path = os.path.join(chunk_dir, "pad.mp4")
+            out = open_video_writer(job, pad_path)
+            out.write(last_frame)
+            out.release()
+            segment_paths.append(pad_path)
+        
+        with stage('concat'):
+            if segment_paths:
+                concat_videos(segment_paths, job.output_path, job.output_fps, job.output_size(), job.encoder)
+            else:
+                open_video_writer(job, job.output_path).release()
+    finally:
+        if manager is not None:
+            manager.shutdown()
+        if not resumable:
+            shutil.rmtree(chunk_dir, ignore_errors=True)
+    if resumable:
+        # Checkpoints are only dropped once the output is complete
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+    return processed_count, padded, reused_count
+
+def report_path(output_path, suffix):
+    # Sidecar file next to an output file or image sequence directory
+    return output_path.rstrip('/\\') + suffix
+
+def write_export_report(job, result, extra=None):
+    report = {'job': job.to_dict(), 'result': {k: v for k, v in result.items() if k != 'stages'},
+              'stages': result.get('stages', {}), 'opencv_version': cv2.__version__,
+              'cpu_count': os.cpu_count()}
+    if extra:
+        report.update(extra)
+    path = report_path(job.output_path, '.report.json')
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+@contextmanager
+def profiled(output_path):
+    # cProfile the block into <output_path>.prof when PROFILE_ENV_VAR is set
+    profiler = None
+    if os.environ.get(PROFILE_ENV_VAR, '0') not in ('', '0'):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another export in this process is already being profiled
+            profiler = None
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            # Only covers the calling thread; pipeline workers and chunk processes are
+            # accounted for by the stage timings instead
+            profiler.disable()
+            profiler.dump_stats(report_path(output_path, '.prof'))
+
+def remove_partial_output(output_path):
+    # Delete what a cancelled export left behind. An image sequence directory may hold other
+    # files, so only its numbered frames go, and the directory itself only if that empties it
+    if os.path.isdir(output_path):
+        for name in os.listdir(output_path):
+            if name.startswith('frame_') and name.endswith(('.png', '.jpg')):
+                os.remove(os.path.join(output_path, name))
+        try:
+            os.rmdir(output_path)
+        except OSError:
+            pass
+    elif os.path.exists(output_path):
+        os.remove(output_path)
+
+def export_video(job, progress=None, keyframes=None, timer=None, report_extra=None, cancel_event=None):
+    # Crop, trim, rescale, drop and pad one clip. progress(done, total) is called as frames complete.
+    # Setting cancel_event stops the export with ExportCancelled and removes the partial output.
+    # Returns a summary dict including per-stage timings; raises on invalid jobs or I/O errors
+    timer = timer if timer is not None else StageTimer()
+    try:
+        with profiled(job.output_path):
+            result = export_video_stages(job, progress, keyframes, timer, cancel_event)
+    except ExportCancelled:
+        remove_partial_output(job.output_path)
+        raise
+    result['stages'] = timer.snapshot()
+    if job.write_report:
+        result['report_path'] = write_export_report(job, result, report_extra)
+    return result
+
+def may_copy_packets(job, info):
+    return job.fast_trim and job.output_format == 'mp4' and is_pure_trim(job, info)
+
+def exports_in_segments(job, frame_indices):
+    # Only MP4 segments can be joined
+    return job.output_format == 'mp4' and (job.checkpoint_frames > 0 or
+                                           job.chunks > 1 and len(frame_indices) >= 2 * job.chunks)
+
+def export_video_stages(job, progress, keyframes, timer, cancel_event=None):
+    if job.threads:
+        cv2.setNumThreads(job.threads)
+    job = replace(job, encoder=resolve_encoder(job.encoder))
+    
+    with timer.stage('plan'):
+        frame_indices, keyframes, info = plan_export(job, keyframes)
+    
+    check_cancelled(cancel_event)
+    start_time = time.perf_counter()
+    if may_copy_packets(job, info):
+        with timer.stage('copy'):
+            trimmed = trim_without_reencode(job, frame_indices[0], frame_indices[-1], keyframes, info)
+        if trimmed is not None:
+            method, first_frame, count = trimmed
+            elapsed = time.perf_counter() - start_time
+            return {
+                'output_path': job.output_path,
+                'method': method,
+                'frames': count,
+                'actual_start_frame': first_frame,
+                'actual_end_frame': first_frame + count - 1,
+                'seconds': elapsed,
+                'fps': count / elapsed if elapsed > 0 else 0.0,
+            }
+    
+    if exports_in_segments(job, frame_indices):
+        processed_count, padded, reused_count = export_chunked(job, frame_indices, keyframes, progress, timer,
+                                                               cancel_event)
+    else:
+        reused_count = 0
+        processed_count, _, last_frame = encode_frames(job, frame_indices, job.output_path, keyframes,
+                                                       progress, job.pad_last_frame, timer, cancel_event)
+        padded = job.pad_last_frame and last_frame is not None
+    elapsed = time.perf_counter() - start_time
+    
+    return {
+        'output_path': job.output_path,
+        'method': 'encode',
+        'encoder': job.encoder if job.output_format == 'mp4' else job.output_format,
+        'frames': processed_count + (1 if padded else 0),
+        # Frames taken from checkpointed segments of an interrupted run, not encoded in this one
+        'reused_frames': reused_count,
+        'seconds': elapsed,
+        'fps': (processed_count - reused_count) / elapsed if elapsed > 0 else 0.0,
+    }
+
+class SharedDecodeOutput:
+    # One clip of a shared decode pass. Crops, resizes and writes the frames handed to it on its
+    # own thread, in the order of its job's frame indices. Prescaled clips are handed the level
+    # of their crop's pyramid they need instead of the whole frame
+    def __init__(self, job, frame_indices, timer=None, max_queued=8):
+        self.job = job
+        self.frame_indices = frame_indices
+        self.timer = timer
+        self.level = None
+        if job.rescale and job.prescale:
+            x1, y1, x2, y2 = job.crop
+            self.level = prescale_levels(int(x2) - int(x1), int(y2) - int(y1), job)
+        # Frames wanted again after a later one (the clamped last frame of drop_frames) are kept
+        self.late = set()
+        highest = -1
+        for frame_idx in frame_indices:
+            if frame_idx < highest:
+                self.late.add(frame_idx)
+            highest = max(highest, frame_idx)
+        self.held = {}
+        self.written = 0
+        self.last_frame = None
+        self.error = None
+        self.frames = queue.Queue(maxsize=max_queued)
+        self.stop_event = Event()
+        self.thread = Thread(target=self.run, daemon=True)
+    
+    def start(self):
+        self.thread.start()
+    
+    def put(self, item):
+        # Returns False once the writer has died, so the decoder doesn't block on a full queue
+        while self.thread.is_alive():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def finish(self):
+        # Flush, pad and close the output after the last frame
+        self.put(None)
+        self.thread.join()
+    
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+    
+    def write_ready(self, out, frame_idx=None, frame=None):
+        # Write every frame that's next in line and available
+        stage = self.timer.stage if self.timer is not None else null_stage
+        while self.written < len(self.frame_indices):
+            wanted = self.frame_indices[self.written]
+            if wanted == frame_idx:
+                next_frame = frame
+            elif wanted in self.held:
+                next_frame = self.held[wanted]
+            else:
+                break
+            with stage('encode'):
+                out.write(next_frame)
+            self.last_frame = next_frame
+            self.written += 1
+    
+    def run(self):
+        stage = self.timer.stage if self.timer is not None else null_stage
+        try:
+            with stage('open'):
+                out = open_video_writer(self.job, self.job.output_path,
+                                        len(self.frame_indices) + (1 if self.job.pad_last_frame else 0))
+            try:
+                while not self.stop_event.is_set():
+                    try:
+                        item = self.frames.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    if item is None:
+                        # Same padding as a standalone export: the last written frame once more
+                        self.write_ready(out)
+                        if self.job.pad_last_frame and self.last_frame is not None:
+                            with stage('encode'):
+                                out.write(self.last_frame)
+                        break
+                    frame_idx, frame = item
+                    with stage('transform'):
+                        if self.level is not None:
+                            transformed = resize_to_target(frame, self.job)
+                        else:
+                            transformed = transform_frame(frame, self.job)
+                    if frame_idx in self.late:
+                        self.held[frame_idx] = transformed
+                    self.write_ready(out, frame_idx, transformed)
+            finally:
+                with stage('finalize'):
+                    out.release()
+        except Exception as e:
+            self.error = e
+
+def decode_shared(input_path, frame_indices, users, outputs, progress=None, keyframes=None, timer=None,
+                  cancel_event=None):
+    # Decode frame_indices once, handing each frame to the outputs in users[frame_idx].
+    # Returns the number of decoded frames; the outputs are finished or stopped on return
+    stage = timer.stage if timer is not None else null_stage
+    # Deepest pyramid level needed per prescaled crop
+    levels = {}
+    for output in outputs:
+        if output.level is not None:
+            levels[output.job.crop] = max(levels.get(output.job.crop, 0), output.level)
+    
+    for output in outputs:
+        output.start()
+    cap = cv2.VideoCapture(input_path)
+    decoded = 0
+    try:
+        for frame_idx, frame in read_frames(cap, frame_indices, keyframes=keyframes, timer=timer):
+            check_cancelled(cancel_event)
+            pyramids = {}
+            for output in users[frame_idx]:
+                image = frame
+                if output.level is not None:
+                    crop = output.job.crop
+                    if crop not in pyramids:
+                        with stage('prescale'):
+                            pyramids[crop] = crop_pyramid(frame, crop, levels[crop])
+                    image = pyramids[crop][output.level]
+                if not output.put((frame_idx, image)):
+                    raise output.error or RuntimeError(f"Writer for {output.job.output_path} stopped")
+            decoded += 1
+            if progress is not None:
+                progress(decoded, len(frame_indices))
+        for output in outputs:
+            output.finish()
+    finally:
+        cap.release()
+        for output in outputs:
+            output.stop()
+    return decoded
+
+def export_shared_decode(jobs, progress=None, keyframes=None, timer=None, report_extra=None, cancel_event=None):
+    # Export several clips (crop, range, rescale, drop) of one video in a single pass that decodes
+    # each frame of the union of their ranges once and hands it to every clip that uses it.
+    # Clips a standalone export would copy packets for or encode in segments are exported that
+    # way instead, so every output matches export_video() of its job. Returns one
+    # export_video()-style result per job; raises on invalid jobs or I/O errors
+    if len({job.input_path for job in jobs}) != 1:
+        raise ValueError("All clips of a shared decode must come from the same video")
+    timer = timer if timer is not None else StageTimer()
+    if jobs[0].threads:
+        cv2.setNumThreads(jobs[0].threads)
+    
+    # Every clip is planned against the same index and frame count, as a standalone export would be
+    given_keyframes = keyframes
+    total_frames = None
+    if keyframes is None:
+        index = SeekIndex.load(jobs[0].input_path)
+        if index is not None:
+            keyframes, total_frames = index.keyframes, index.frame_count
+    results = [None] * len(jobs)
+    shared = []
+    plans = []
+    for i, job in enumerate(jobs):
+        with timer.stage('plan'):
+            frame_indices, _, info = plan_export(job, keyframes, total_frames)
+        if may_copy_packets(job, info) or exports_in_segments(job, frame_indices):
+            results[i] = export_video(job, progress, given_keyframes, report_extra=report_extra,
+                                      cancel_event=cancel_event)
+        else:
+            shared.append(i)
+            plans.append(frame_indices)
+    if not shared:
+        return results
+    jobs = [replace(jobs[i], encoder=resolve_encoder(jobs[i].encoder)) for i in shared]
+    union = sorted(set().union(*plans))
+    outputs = [SharedDecodeOutput(job, frame_indices, timer) for job, frame_indices in zip(jobs, plans)]
+    users = {}
+    for output, frame_indices in zip(outputs, plans):
+        for frame_idx in set(frame_indices):
+            users.setdefault(frame_idx, []).append(output)
+    
+    start_time = time.perf_counter()
+    try:
+        with profiled(jobs[0].output_path):
+            decoded = decode_shared(jobs[0].input_path, union, users, outputs, progress, keyframes, timer,
+                                    cancel_event)
+    except ExportCancelled:
+        for job in jobs:
+            remove_partial_output(job.output_path)
+        raise
+    elapsed = time.perf_counter() - start_time
+    
+    for output in outputs:
+        if output.error is not None:
+            raise output.error
+    
+    stages = timer.snapshot()
+    for i, output in zip(shared, outputs):
+        padded = output.job.pad_last_frame and output.last_frame is not None
+        result = {
+            'output_path': output.job.output_path,
+            'method': 'shared_decode',
+            'encoder': output.job.encoder if output.job.output_format == 'mp4' else output.job.output_format,
+            'frames': output.written + (1 if padded else 0),
+            'decoded_frames': decoded,
+            'seconds': elapsed,
+            'fps': output.written / elapsed if elapsed > 0 else 0.0,
+            'stages': stages,
+        }
+        if output.job.write_report:
+            result['report_path'] = write_export_report(output.job, result, report_extra)
+        results[i] = result
+    return results
+
+def benchmark_encoders(video_path, frame_count=120, configurations=None):
+    # Encode the same decoded frames with each backend configuration and compare speed and size
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frames = []
+    while len(frames) < frame_count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise IOError(f"Cannot read frames from {video_path}")
+    
+    # 4:2:0 encoders need even dimensions
+    height, width = frames[0].shape[:2]
+    crop = (0, 0, width - width % 2, height - height % 2)
+    
+    if configurations is None:
+        configurations = [{'encoder': 'opencv'}]
+        if 'ffmpeg' in available_encoders():
+            configurations += [{'encoder': 'ffmpeg', 'codec': 'libx264', 'preset': preset}
+                               for preset in ('ultrafast', 'veryfast', 'medium')]
+    
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for i, config in enumerate(configurations):
+            output_path = os.path.join(tmp_dir, f"bench-{i}.mp4")
+            job = ExportJob(video_path, output_path, crop, output_fps=fps, **config)
+            start_time = time.perf_counter()
+            out = open_video_writer(job, output_path)
+            for frame in frames:
+                out.write(frame[:crop[3], :crop[2]])
+            out.release()
+            elapsed = time.perf_counter() - start_time
+            results.append(dict(config, frames=len(frames), fps=len(frames) / elapsed,
+                                bytes=os.path.getsize(output_path)))
+    return results
+
+# Synthetic sources for the benchmark suite: resolution, length and keyframe interval
+BENCH_SOURCES = [
+    {'width': 640, 'height': 360, 'frames': 240, 'gop': 12},
+    {'width': 640, 'height': 360, 'frames': 240, 'gop': 250},
+    {'width': 1920, 'height': 1080, 'frames': 240, 'gop': 12},
+    {'width': 1920, 'height': 1080, 'frames': 240, 'gop': 250},
+]
+BENCH_QUICK_SOURCES = [{'width': 640, 'height': 360, 'frames': 120, 'gop': 30}]
+BENCH_CASES = ['export_full', 'export_drop', 'export_rescale', 'seek_random', 'display']
+
+def keyframe_interval(index):
+    # Typical distance between keyframes of a SeekIndex
+    if len(index.keyframes) < 2:
+        return index.frame_count
+    return int(np.median(np.diff(index.keyframes)))
+
+def make_synthetic_video(path, width, height, frames, gop, fps=30.0):
+    # Moving gradient with noise, so the encoder and decoder have real work to do.
+    # Returns the keyframe interval the file really has: OpenCV's mp4v writer ignores the
+    # requested one, so gop is only honoured when ffmpeg is around to write MPEG-4 with -g
+    if find_ffmpeg() is not None:
+        job = ExportJob(path, path, (0, 0, width, height), codec='mpeg4', pix_fmt='yuv420p')
+        out = FFmpegEncoder(path, fps, (width, height), job, ['-g', str(gop), '-q:v', '4'])
+    else:
+        out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    noise = rng.integers(0, 32, (height, width, 3), dtype=np.uint8)
+    for i in range(frames):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[..., 0] = (x + 4 * i) % 256
+        frame[..., 1] = (y + 2 * i) % 256
+        frame[..., 2] = (x[::-1] + y) / 2
+        frame += np.roll(noise, i, axis=1)
+        out.write(frame)
+    out.release()
+    
+    index = SeekIndex.build(path)
+    return keyframe_interval(index) if index is not None else gop
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 1024 if sys.platform != 'darwin' else peak / (1024 * 1024)
+
+def latency_stats(latencies):
+    if not latencies:
+        return {'p50_ms': None, 'p95_ms': None}
+    values = np.array(latencies) * 1000
+    return {'p50_ms': float(np.percentile(values, 50)), 'p95_ms': float(np.percentile(values, 95))}
+
+def bench_case(video_path, case, work_dir):
+    # Runs in a fresh process so peak RSS belongs to this case alone
+    info = probe_video(video_path)
+    width, height, total = info['width'], info['height'], info['frame_count']
+    index = SeekIndex.build(video_path)
+    keyframes = index.keyframes if index is not None else None
+    latencies = []
+    
+    if case.startswith('export'):
+        job = ExportJob(video_path, os.path.join(work_dir, f"{case}.mp4"),
+                        (width // 8, height // 8, width - width // 8, height - height // 8),
+                        drop_frames=case == 'export_drop', target_frames=max(1, total // 4),
+                        rescale=case == 'export_rescale', target_width=512, target_height=512,
+                        output_fps=info['fps'], fast_trim=False)
+        last = [time.perf_counter()]
+        
+        def progress(done, count):
+            now = time.perf_counter()
+            latencies.append(now - last[0])
+            last[0] = now
+        
+        start_time = time.perf_counter()
+        result = export_video(job, progress, keyframes)
+        elapsed = time.perf_counter() - start_time
+        frames = result['frames']
+    elif case == 'seek_random':
+        # load_frame-style access: nearest keyframe, then decode forward
+        cap = cv2.VideoCapture(video_path)
+        targets = random.Random(0).sample(range(total), min(60, total))
+        position = None
+        start_time = time.perf_counter()
+        for frame_num in targets:
+            t = time.perf_counter()
+            for _ in read_frames(cap, [frame_num], keyframes=keyframes, position=position):
+                pass
+            position = frame_num + 1
+            latencies.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - start_time
+        cap.release()
+        frames = len(targets)
+    else:
+        # Display conversion and letterboxing as done for every previewed frame
+        cap = cv2.VideoCapture(video_path)
+        decoded = []
+        while len(decoded) < 60:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            decoded.append(frame)
+        cap.release()
+        # The preview's renderer, minus the hand-off to Tk, which needs a display
+        renderer = DisplayRenderer(None)
+        renderer.configure(width, height, 800, 450)
+        size = (renderer.frame_width, renderer.frame_height)
+        start_time = time.perf_counter()
+        for frame in decoded:
+            t = time.perf_counter()
+            renderer.render(to_display_frame(frame, size))
+            latencies.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - start_time
+        frames = len(decoded)
+    
+    return dict({'fps': frames / elapsed if elapsed > 0 else 0.0, 'frames': frames,
+                 'peak_rss_mb': peak_rss_mb()}, **latency_stats(latencies))
+
+def run_benchmarks(quick=False, work_dir=None):
+    sources = BENCH_QUICK_SOURCES if quick else BENCH_SOURCES
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        for source in sources:
+            prefix = f"{source['width']}x{source['height']}-{source['frames']}f"
+            video_path = os.path.join(tmp_dir, f"{prefix}-{len(results)}.mp4")
+            # Cases are labelled with the keyframe interval the source really got, and sources that
+            # came out the same as an earlier one are skipped
+            gop = make_synthetic_video(video_path, source['width'], source['height'], source['frames'],
+                                       source['gop'])
+            name = f"{prefix}-gop{gop}"
+            if gop != source['gop']:
+                print(f"Benchmark source {prefix}-gop{source['gop']} got keyframes every {gop} frames",
+                      file=sys.stderr)
+            if f"{name}/{BENCH_CASES[0]}" in results:
+                continue
+            for case in BENCH_CASES:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    results[f"{name}/{case}"] = executor.submit(bench_case, video_path, case, tmp_dir).result()
+    return results
+
+def compare_benchmarks(results, baseline, tolerance=0.15):
+    # Cases whose throughput dropped or p95 latency grew by more than tolerance
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if base['fps'] and result['fps'] < base['fps'] * (1 - tolerance):
+            regressions.append({'case': key, 'metric': 'fps', 'baseline': base['fps'], 'current': result['fps']})
+        if base.get('p95_ms') and result.get('p95_ms') and result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append({'case': key, 'metric': 'p95_ms', 'baseline': base['p95_ms'],
+                                'current': result['p95_ms']})
+    return regressions
+
+def run_export_job(job_data):
+    # Process pool entry point: never raises, reports failures in the result instead
+    result = {'input_path': job_data.get('input_path'), 'output_path': job_data.get('output_path')}
+    try:
+        result.update(export_video(ExportJob.from_dict(job_data)))
+        result['ok'] = True
+    except Exception as e:
+        result['ok'] = False
+        result['error'] = str(e)
+    return result
+
+def load_job_list(path):
+    # A JSON list of jobs, or one JSON job per line
+    with open(path, 'r') as f:
+        text = f.read()
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def run_jobs(jobs, processes=None, on_result=None):
+    # Run job dicts across a process pool. Returns (results in job order, summary)
+    results = [None] * len(jobs)
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {executor.submit(run_export_job, job): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if on_result is not None:
+                on_result(result)
+    elapsed = time.perf_counter() - start_time
+    
+    total_frames = sum(r.get('frames', 0) for r in results if r['ok'])
+    summary = {
+        'jobs': len(jobs),
+        'succeeded': sum(1 for r in results if r['ok']),
+        'failed': sum(1 for r in results if not r['ok']),
+        'frames': total_frames,
+        'seconds': elapsed,
+        'fps': total_frames / elapsed if elapsed > 0 else 0.0,
+    }
+    return results, summary
+
+# Per-video project file holding the GUI settings and the outputs exported from the video
+SIDECAR_SUFFIX = '.crop.json'
+
+def load_sidecar(video_path):
+    try:
+        with open(video_path + SIDECAR_SUFFIX, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    data.setdefault('outputs', {})
+    data.setdefault('builds', {})
+    return data
+
+def save_sidecar(video_path, data):
+    # Replace atomically, so a crash never leaves half a project file
+    path = video_path + SIDECAR_SUFFIX
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def update_sidecar(video_path, settings=None, outputs=(), builds=None):
+    # Merge settings, output jobs and {output_path: job_hash} build stamps into a video's sidecar
+    data = load_sidecar(video_path) or {'settings': {}, 'outputs': {}, 'builds': {}}
+    if settings is not None:
+        data['settings'] = settings
+    for job in outputs:
+        data['outputs'][job.output_path] = job.to_dict()
+    data['builds'].update(builds or {})
+    save_sidecar(video_path, data)
+
+def find_sidecars(paths):
+    # Videos with a sidecar among paths, which may be sidecars, videos or folders to search
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                videos.extend(os.path.join(root, name[:-len(SIDECAR_SUFFIX)])
+                              for name in sorted(names) if name.endswith(SIDECAR_SUFFIX))
+        elif path.endswith(SIDECAR_SUFFIX):
+            videos.append(path[:-len(SIDECAR_SUFFIX)])
+        elif os.path.exists(path + SIDECAR_SUFFIX):
+            videos.append(path)
+    return videos
+
+def rebuild(paths, processes=None, force=False, on_result=None):
+    # Re-export, in parallel, the sidecar outputs whose source or parameters changed since they
+    # were last built, and stamp the rebuilt ones. Returns (results, summary) like run_jobs
+    todo = []
+    skipped = []
+    up_to_date = 0
+    for video_path in find_sidecars(paths):
+        data = load_sidecar(video_path)
+        if data is None:
+            continue
+        for output_path, job_data in data['outputs'].items():
+            try:
+                job = ExportJob.from_dict(job_data)
+                digest = job_hash(job)
+            except (OSError, ValueError) as e:
+                skipped.append({'input_path': job_data.get('input_path'), 'output_path': output_path,
+                                'ok': False, 'error': str(e)})
+                continue
+            if force or data['builds'].get(output_path) != digest or not os.path.exists(output_path):
+                todo.append((video_path, job, digest))
+            else:
+                up_to_date += 1
+    
+    results, summary = run_jobs([job.to_dict() for _, job, _ in todo], processes, on_result)
+    for result in skipped:
+        if on_result is not None:
+            on_result(result)
+    
+    builds = {}
+    for (video_path, job, digest), result in zip(todo, results):
+        if result['ok']:
+            builds.setdefault(video_path, {})[job.output_path] = digest
+    for video_path, video_builds in builds.items():
+        update_sidecar(video_path, builds=video_builds)
+    
+    summary['up_to_date'] = up_to_date
+    summary['failed'] += len(skipped)
+    return results + skipped, summary
+
+def progress_text(done, total, elapsed):
+    # "42% at 31.5 fps, ETA 1:05"
+    if not total or not done or elapsed <= 0:
+        return ""
+    fps = done / elapsed
+    remaining = (total - done) / fps
+    return f"{100 * done / total:.0f}% at {fps:.1f} fps, ETA {int(remaining // 60)}:{int(remaining % 60):02d}"
+
+class QueuedExport:
+    # One entry of the export queue: an immutable job, or clips of one video sharing a decode pass
+    def __init__(self, entry_id, jobs, report_extra=None):
+        self.entry_id = entry_id
+        self.jobs = tuple(jobs)
+        self.report_extra = report_extra
+        # Whether the entry is waiting in the pending queue (possibly cancelled)
+        self.in_queue = False
+        self.reset()
+    
+    def reset(self):
+        self.status = 'queued'
+        self.done = 0
+        self.total = 0
+        self.started = None
+        self.results = None
+        self.error = None
+        self.cancel_event = Event()
+        # Set by whoever handles the finished export's results, which must happen only once
+        self.completion_handled = False
+    
+    def finished(self):
+        return self.status in ('done', 'failed', 'cancelled')
+    
+    def progress_text(self):
+        if self.status != 'running':
+            return ""
+        return progress_text(self.done, self.total, time.perf_counter() - self.started)
+
+class ExportQueue:
+    # Runs queued exports on background threads. on_update(entry, status) is called from those
+    # threads whenever an entry changes state or makes progress, with the status at that moment
+    def __init__(self, workers=1, on_update=None):
+        self.pending = queue.Queue()
+        self.entries = []
+        self.lock = Lock()
+        self.workers = 0
+        self.running_workers = 0
+        self.next_id = 1
+        self.on_update = on_update
+        self.set_workers(workers)
+    
+    def set_workers(self, workers):
+        # Extra workers exit after their current job when the count is lowered
+        with self.lock:
+            self.workers = max(1, workers)
+            while self.running_workers < self.workers:
+                self.running_workers += 1
+                Thread(target=self.worker, daemon=True).start()
+    
+    def submit(self, jobs, report_extra=None):
+        with self.lock:
+            entry = QueuedExport(self.next_id, jobs, report_extra)
+            self.next_id += 1
+            self.entries.append(entry)
+            entry.in_queue = True
+            self.pending.put(entry)
+        self.notify(entry)
+        return entry
+    
+    def cancel(self, entry):
+        # Queued entries are skipped, running ones stop at their next frame and remove their output
+        with self.lock:
+            if entry.finished():
+                return
+            if entry.status == 'queued':
+                entry.status = 'cancelled'
+            else:
+                entry.status = 'cancelling'
+            entry.cancel_event.set()
+        self.notify(entry)
+    
+    def retry(self, entry):
+        with self.lock:
+            if entry.status not in ('failed', 'cancelled'):
+                return
+            entry.reset()
+            # An entry cancelled while queued is still in the queue and runs from there
+            if not entry.in_queue:
+                entry.in_queue = True
+                self.pending.put(entry)
+        self.notify(entry)
+    
+    def clear_finished(self):
+        with self.lock:
+            removed = [entry for entry in self.entries if entry.finished()]
+            self.entries = [entry for entry in self.entries if not entry.finished()]
+        return removed
+    
+    def notify(self, entry):
+        if self.on_update is not None:
+            self.on_update(entry, entry.status)
+    
+    def worker(self):
+        while True:
+            with self.lock:
+                if self.running_workers > self.workers:
+                    self.running_workers -= 1
+                    return
+            try:
+                entry = self.pending.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # Claim the entry so a cancel or retry racing with this worker can't start it twice
+            with self.lock:
+                entry.in_queue = False
+                if entry.status != 'queued':
+                    continue
+                entry.status = 'running'
+            self.run_entry(entry)
+    
+    def run_entry(self, entry):
+        entry.started = time.perf_counter()
+        self.notify(entry)
+        
+        throttle = ProgressThrottle()
+        
+        def progress(done, total):
+            entry.done, entry.total = done, total
+            if throttle.ready(done, total):
+                self.notify(entry)
+        
+        try:
+            if len(entry.jobs) == 1:
+                entry.results = [export_video(entry.jobs[0], progress, report_extra=entry.report_extra,
+                                              cancel_event=entry.cancel_event)]
+            else:
+                entry.results = export_shared_decode(entry.jobs, progress, report_extra=entry.report_extra,
+                                                     cancel_event=entry.cancel_event)
+            entry.status = 'done'
+        except ExportCancelled:
+            entry.status = 'cancelled'
+        except Exception as e:
+            entry.status = 'failed'
+            entry.error = str(e)
+        self.notify(entry)
 
 class VideoCropperApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Enhanced Video Cropper")
-        self.root.geometry("1000x750")
+        self.root.geometry("1000x960")
         
         # Video properties
         self.video_path = None
         self.video = None
+        self.video_position = None
+        self.seek_index = None
         self.total_frames = 0
         self.current_frame = 0
         self.fps = 30
@@ -51,7 +2626,32 @@ class VideoCropperApp:
         
         # Playback state
         self.is_playing = False
-        self.playback_thread = None
+        self.playback_after_id = None
+        self.playback_clock = None
+        self.pending_playback_frame = None
+        self.read_ahead = None
+        
+        # Low-resolution proxy used for previews instead of the source
+        self.use_proxy_var = tk.BooleanVar(value=False)
+        self.proxy_path = None
+        self.proxy_cancel = None
+        
+        # Filmstrip thumbnails
+        self.filmstrip_indices = []
+        self.filmstrip_photos = []
+        self.filmstrip_cancel = None
+        
+        # Scene cuts marked on the filmstrip and offered as frame ranges
+        self.scene_cuts = []
+        self.scene_cancel = None
+        self.scene_var = tk.StringVar()
+        
+        # Decoded frame cache for scrubbing
+        self.frame_cache_mb = tk.IntVar(value=256)
+        self.frame_cache = FrameCache(self.frame_cache_mb.get())
+        
+        # Time spent per stage of load_frame, included in export reports
+        self.preview_timer = StageTimer()
         
         # New features
         self.manual_frame_var = tk.IntVar(value=0)
@@ -62,6 +2662,9 @@ class VideoCropperApp:
         self.rescale_var = tk.BooleanVar(value=False)
         self.target_width = tk.IntVar(value=512)
         self.target_height = tk.IntVar(value=512)
+        self.interpolation_var = tk.StringVar(value='lanczos')
+        # Extra center-crop sizes exported next to the main output from the same decode, e.g. "512x512, 768x432:area"
+        self.buckets_var = tk.StringVar(value="")
         
         self.drop_frames_var = tk.BooleanVar(value=False)
         self.target_frames = tk.IntVar(value=100)
@@ -69,13 +2672,61 @@ class VideoCropperApp:
         self.pad_last_frame_var = tk.BooleanVar(value=False)
         
         self.output_fps = tk.DoubleVar(value=30.0)
+        self.output_format_var = tk.StringVar(value='mp4')
+        
+        self.chunks_var = tk.IntVar(value=1)
+        self.checkpoint_frames_var = tk.IntVar(value=0)
+        
+        # Pure temporal trims are copied instead of re-encoded
+        self.fast_trim_var = tk.BooleanVar(value=True)
+        self.keyframe_snap_var = tk.BooleanVar(value=False)
         
-        # Progress window
-        self.progress_window = None
-        self.progress_bar = None
-        self.progress_label = None
+        # Encoder backends found at startup; ffmpeg is optional
+        self.encoder_names = available_encoders()
+        self.encoder_var = tk.StringVar(value=self.encoder_names[0])
+        self.codec_var = tk.StringVar(value='libx264')
+        self.crf_var = tk.IntVar(value=18)
+        self.preset_var = tk.StringVar(value='medium')
+        self.pix_fmt_var = tk.StringVar(value='yuv420p')
+        self.encoder_threads_var = tk.IntVar(value=0)
+        self.workers_var = tk.IntVar(value=max(1, min(4, os.cpu_count() or 1)))
+        
+        # Per-stage timings saved next to each export
+        self.write_report_var = tk.BooleanVar(value=True)
+        
+        # Clips exported together from one decode pass per source video
+        self.clip_jobs = []
+        self.clip_listbox = None
+        
+        # Settings of the open video as it was opened; its sidecar is only written once they change
+        self.opened_settings = None
+        
+        # Folder mode: metadata index of every video in the opened folder, opened on first use
+        self.video_index = None
+        self.browser_window = None
+        self.browser_tree = None
+        self.browser_folder = None
+        self.filter_min_width = tk.IntVar(value=0)
+        self.filter_min_height = tk.IntVar(value=0)
+        self.filter_min_fps = tk.DoubleVar(value=0.0)
+        self.filter_max_fps = tk.DoubleVar(value=0.0)
+        self.filter_min_seconds = tk.DoubleVar(value=0.0)
+        self.filter_max_seconds = tk.DoubleVar(value=0.0)
+        self.filter_exported = tk.StringVar(value='Any')
+        
+        # Callbacks posted by worker threads, run on the Tk main loop
+        self.ui_events = queue.Queue()
+        
+        # Exports run in the background while the next video is marked up
+        self.export_workers_var = tk.IntVar(value=1)
+        self.export_queue = ExportQueue(self.export_workers_var.get(),
+                                        on_update=lambda entry, status: self.post_ui(self.refresh_queue_entry,
+                                                                                      entry, status))
+        self.queue_entries = {}
         
         self.setup_ui()
+        self.drain_ui_events()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
     def setup_ui(self):
         # Main container
@@ -89,6 +2740,7 @@ class VideoCropperApp:
         # Video display area
         self.canvas = tk.Canvas(left_panel, width=self.display_width, height=self.display_height, bg='black')
         self.canvas.grid(row=0, column=0, pady=10)
+        self.renderer = DisplayRenderer(self.canvas)
         
         # Bind mouse events
         self.canvas.bind("<Button-1>", self.on_mouse_down)
@@ -125,13 +2777,22 @@ class VideoCropperApp:
         self.manual_frame_entry.pack(side=tk.LEFT, padx=2)
         self.manual_frame_entry.bind("<Return>", self.on_manual_frame_enter)
         
+        # Filmstrip of evenly spaced thumbnails under the timeline
+        self.filmstrip = tk.Canvas(left_panel, width=self.display_width, height=FILMSTRIP_HEIGHT, bg='black',
+                                   highlightthickness=0)
+        self.filmstrip.grid(row=2, column=0)
+        self.filmstrip.bind("<Button-1>", self.on_filmstrip_click)
+        
         # Control buttons
         button_frame = ttk.Frame(left_panel)
-        button_frame.grid(row=2, column=0, pady=10)
+        button_frame.grid(row=3, column=0, pady=10)
         
         self.load_btn = ttk.Button(button_frame, text="Load Video", command=self.load_video)
         self.load_btn.pack(side=tk.LEFT, padx=5)
         
+        self.open_folder_btn = ttk.Button(button_frame, text="Open Folder", command=self.open_folder)
+        self.open_folder_btn.pack(side=tk.LEFT, padx=5)
+        
         self.play_btn = ttk.Button(button_frame, text="Play", command=self.toggle_playback, state='disabled')
         self.play_btn.pack(side=tk.LEFT, padx=5)
         
@@ -144,9 +2805,13 @@ class VideoCropperApp:
         self.crop_btn = ttk.Button(button_frame, text="Crop Video", command=self.crop_video, state='disabled')
         self.crop_btn.pack(side=tk.LEFT, padx=5)
         
+        self.export_job_btn = ttk.Button(button_frame, text="Export Job", command=self.export_job_line,
+                                         state='disabled')
+        self.export_job_btn.pack(side=tk.LEFT, padx=5)
+        
         # Temporal cropping
         temporal_frame = ttk.LabelFrame(left_panel, text="Temporal Cropping", padding="10")
-        temporal_frame.grid(row=3, column=0, pady=10, sticky=(tk.W, tk.E))
+        temporal_frame.grid(row=4, column=0, pady=10, sticky=(tk.W, tk.E))
         
         ttk.Label(temporal_frame, text="Start Frame:").grid(row=0, column=0, sticky=tk.W)
         self.start_frame_var = tk.IntVar(value=0)
@@ -158,9 +2823,46 @@ class VideoCropperApp:
         self.end_frame_entry = ttk.Entry(temporal_frame, textvariable=self.end_frame_var, width=10)
         self.end_frame_entry.grid(row=0, column=3, padx=5)
         
+        self.detect_scenes_btn = ttk.Button(temporal_frame, text="Detect Scenes", command=self.start_scene_detection,
+                                            state='disabled')
+        self.detect_scenes_btn.grid(row=0, column=4, padx=(20, 5))
+        ttk.Label(temporal_frame, text="Scene:").grid(row=0, column=5, sticky=tk.W)
+        self.scene_combo = ttk.Combobox(temporal_frame, textvariable=self.scene_var, state='readonly', width=14)
+        self.scene_combo.grid(row=0, column=6, padx=5)
+        self.scene_combo.bind("<<ComboboxSelected>>", self.on_scene_selected)
+        
         # Status
-        self.status_label = ttk.Label(left_panel, text="No video loaded", relief=tk.SUNKEN)
-        self.status_label.grid(row=4, column=0, pady=10, sticky=(tk.W, tk.E))
+        status_frame = ttk.Frame(left_panel)
+        status_frame.grid(row=5, column=0, pady=10, sticky=(tk.W, tk.E))
+        
+        self.status_label = ttk.Label(status_frame, text="No video loaded", relief=tk.SUNKEN)
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        self.cache_label = ttk.Label(status_frame, text=self.frame_cache.stats_text(), relief=tk.SUNKEN)
+        self.cache_label.pack(side=tk.RIGHT, padx=(5, 0))
+        
+        # Background export queue
+        queue_frame = ttk.LabelFrame(left_panel, text="Export Queue", padding="10")
+        queue_frame.grid(row=6, column=0, pady=10, sticky=(tk.W, tk.E))
+        queue_frame.columnconfigure(0, weight=1)
+        
+        self.queue_tree = ttk.Treeview(queue_frame, columns=('output', 'status', 'progress'), show='headings',
+                                       height=4)
+        for column, heading, width in [('output', "Output", 300), ('status', "Status", 90),
+                                       ('progress', "Progress", 220)]:
+            self.queue_tree.heading(column, text=heading)
+            self.queue_tree.column(column, width=width, stretch=column == 'output')
+        self.queue_tree.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        
+        queue_buttons = ttk.Frame(queue_frame)
+        queue_buttons.grid(row=1, column=0, pady=(5, 0), sticky=tk.W)
+        ttk.Button(queue_buttons, text="Cancel", command=self.cancel_selected_exports).pack(side=tk.LEFT, padx=2)
+        ttk.Button(queue_buttons, text="Retry", command=self.retry_selected_exports).pack(side=tk.LEFT, padx=2)
+        ttk.Button(queue_buttons, text="Clear Finished", command=self.clear_finished_exports).pack(side=tk.LEFT,
+                                                                                                  padx=2)
+        ttk.Label(queue_buttons, text="Workers:").pack(side=tk.LEFT, padx=(20, 5))
+        ttk.Entry(queue_buttons, textvariable=self.export_workers_var, width=4).pack(side=tk.LEFT)
+        self.export_workers_var.trace_add('write', self.on_export_workers_change)
         
         # Right panel (controls)
         right_panel = ttk.Frame(main_frame)
@@ -184,6 +2886,9 @@ class VideoCropperApp:
             entry.bind("<KeyRelease>", lambda e, lbl=label: self.on_coord_change(e, lbl))
             self.coord_entries[label] = entry
         
+        ttk.Button(crop_frame, text="Auto Crop", command=self.auto_crop).grid(row=4, column=0, columnspan=2,
+                                                                             pady=(5, 0))
+        
         # Aspect ratio display
         self.aspect_label = ttk.Label(right_panel, text="Aspect Ratio: N/A")
         self.aspect_label.pack(pady=5)
@@ -213,9 +2918,82 @@ class VideoCropperApp:
         pad_check = ttk.Checkbutton(process_frame, text="Pad Last Frame", variable=self.pad_last_frame_var)
         pad_check.grid(row=5, column=0, columnspan=2, sticky=tk.W, pady=5)
         
-        # Output FPS
-        ttk.Label(process_frame, text="Output FPS:").grid(row=6, column=0, sticky=tk.W, pady=2)
-        ttk.Entry(process_frame, textvariable=self.output_fps, width=8).grid(row=6, column=1, padx=5, pady=2)
+        # Output FPS
+        ttk.Label(process_frame, text="Output FPS:").grid(row=6, column=0, sticky=tk.W, pady=2)
+        ttk.Entry(process_frame, textvariable=self.output_fps, width=8).grid(row=6, column=1, padx=5, pady=2)
+        
+        # Output format
+        ttk.Label(process_frame, text="Output Format:").grid(row=11, column=0, sticky=tk.W, pady=2)
+        ttk.Combobox(process_frame, textvariable=self.output_format_var, values=OUTPUT_FORMATS,
+                     state='readonly', width=6).grid(row=11, column=1, padx=5, pady=2)
+        
+        # Parallel chunked encoding
+        ttk.Label(process_frame, text="Parallel Chunks:").grid(row=7, column=0, sticky=tk.W, pady=2)
+        ttk.Entry(process_frame, textvariable=self.chunks_var, width=8).grid(row=7, column=1, padx=5, pady=2)
+        
+        # Crop/resize threads between decoding and encoding
+        ttk.Label(process_frame, text="Resize Workers:").grid(row=8, column=0, sticky=tk.W, pady=2)
+        ttk.Entry(process_frame, textvariable=self.workers_var, width=8).grid(row=8, column=1, padx=5, pady=2)
+        
+        # No-re-encode path for pure temporal trims
+        fast_trim_check = ttk.Checkbutton(process_frame, text="Copy Pure Trims", variable=self.fast_trim_var)
+        fast_trim_check.grid(row=9, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
+        snap_check = ttk.Checkbutton(process_frame, text="Allow Keyframe Snapping", variable=self.keyframe_snap_var)
+        snap_check.grid(row=10, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
+        report_check = ttk.Checkbutton(process_frame, text="Write Timing Report", variable=self.write_report_var)
+        report_check.grid(row=12, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
+        # Resumable exports
+        ttk.Label(process_frame, text="Checkpoint Frames:").grid(row=13, column=0, sticky=tk.W, pady=2)
+        ttk.Entry(process_frame, textvariable=self.checkpoint_frames_var, width=8).grid(row=13, column=1, padx=5,
+                                                                                       pady=2)
+        
+        # Resampling of the rescale, and size buckets exported together
+        ttk.Label(process_frame, text="Interpolation:").grid(row=14, column=0, sticky=tk.W, pady=2)
+        ttk.Combobox(process_frame, textvariable=self.interpolation_var, values=list(INTERPOLATIONS),
+                     state='readonly', width=8).grid(row=14, column=1, padx=5, pady=2)
+        
+        ttk.Label(process_frame, text="Buckets:").grid(row=15, column=0, sticky=tk.W, pady=2)
+        ttk.Entry(process_frame, textvariable=self.buckets_var, width=16).grid(row=15, column=1, padx=5, pady=2)
+        
+        # Encoder options
+        encoder_frame = ttk.LabelFrame(right_panel, text="Encoder", padding="10")
+        encoder_frame.pack(pady=10, fill=tk.BOTH, expand=True)
+        
+        ttk.Label(encoder_frame, text="Backend:").grid(row=0, column=0, sticky=tk.W, pady=2)
+        ttk.Combobox(encoder_frame, textvariable=self.encoder_var, values=self.encoder_names,
+                     state='readonly', width=8).grid(row=0, column=1, padx=5, pady=2)
+        
+        # Only used by the ffmpeg backend
+        for row, (label, var) in enumerate([("Codec:", self.codec_var), ("CRF:", self.crf_var),
+                                            ("Preset:", self.preset_var), ("Pixel Format:", self.pix_fmt_var),
+                                            ("Threads:", self.encoder_threads_var)], start=1):
+            ttk.Label(encoder_frame, text=label).grid(row=row, column=0, sticky=tk.W, pady=2)
+            ttk.Entry(encoder_frame, textvariable=var, width=10).grid(row=row, column=1, padx=5, pady=2)
+        
+        # Clips sharing a decode pass
+        clip_frame = ttk.LabelFrame(right_panel, text="Clip List", padding="10")
+        clip_frame.pack(pady=10, fill=tk.BOTH, expand=True)
+        
+        self.clip_listbox = tk.Listbox(clip_frame, height=4, width=30)
+        self.clip_listbox.grid(row=0, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=2)
+        ttk.Button(clip_frame, text="Add Clip", command=self.add_clip).grid(row=1, column=0, padx=2, pady=2)
+        ttk.Button(clip_frame, text="Remove", command=self.remove_clip).grid(row=1, column=1, padx=2, pady=2)
+        ttk.Button(clip_frame, text="Export Clips", command=self.export_clips).grid(row=1, column=2, padx=2, pady=2)
+        
+        # Preview options
+        preview_frame = ttk.LabelFrame(right_panel, text="Preview Options", padding="10")
+        preview_frame.pack(pady=10, fill=tk.BOTH, expand=True)
+        
+        ttk.Label(preview_frame, text="Frame Cache (MB):").grid(row=0, column=0, sticky=tk.W, pady=2)
+        ttk.Entry(preview_frame, textvariable=self.frame_cache_mb, width=8).grid(row=0, column=1, padx=5, pady=2)
+        self.frame_cache_mb.trace_add('write', self.on_frame_cache_budget_change)
+        
+        proxy_check = ttk.Checkbutton(preview_frame, text="Use Proxy", variable=self.use_proxy_var,
+                                      command=self.on_proxy_toggle)
+        proxy_check.grid(row=1, column=0, columnspan=2, sticky=tk.W, pady=5)
         
         # Configure grid weights
         self.root.columnconfigure(0, weight=1)
@@ -226,6 +3004,173 @@ class VideoCropperApp:
         left_panel.columnconfigure(0, weight=1)
         left_panel.rowconfigure(0, weight=1)
     
+    def post_ui(self, callback, *args):
+        # Worker threads must not touch Tk; they queue callbacks for the main loop instead
+        self.ui_events.put((callback, args))
+    
+    def drain_ui_events(self):
+        # Run the callbacks queued so far, leaving later ones to the next poll. Scheduled first
+        # so a failing callback doesn't stop the polling
+        self.root.after(UI_POLL_MS, self.drain_ui_events)
+        for _ in range(self.ui_events.qsize()):
+            callback, args = self.ui_events.get_nowait()
+            callback(*args)
+    
+    def on_frame_cache_budget_change(self, *args):
+        try:
+            self.frame_cache.set_budget(max(0, self.frame_cache_mb.get()))
+        except tk.TclError:
+            # Ignore partial input while typing
+            return
+        self.cache_label.config(text=self.frame_cache.stats_text())
+    
+    def on_proxy_toggle(self):
+        if self.video_path is None:
+            return
+        if self.use_proxy_var.get():
+            self.start_proxy_build()
+        else:
+            self.cancel_proxy_build()
+            self.set_preview_source(None)
+    
+    def start_proxy_build(self):
+        self.cancel_proxy_build()
+        proxy_size = self.update_display_geometry()
+        proxy_path = cache_file(self.video_path, f"proxy-{proxy_size[0]}x{proxy_size[1]}.avi")
+        if os.path.exists(proxy_path):
+            self.set_preview_source(proxy_path)
+            return
+        
+        self.proxy_cancel = Event()
+        Thread(target=self.build_proxy_worker, args=(self.video_path, proxy_path, proxy_size, self.proxy_cancel),
+               daemon=True).start()
+    
+    def cancel_proxy_build(self):
+        if self.proxy_cancel is not None:
+            self.proxy_cancel.set()
+            self.proxy_cancel = None
+    
+    def build_proxy_worker(self, video_path, proxy_path, proxy_size, cancel_event):
+        throttle = ProgressThrottle()
+        
+        def progress(count, total):
+            if total > 0 and throttle.ready(count, total):
+                self.post_ui(self.status_label.config, {'text': f"Building proxy... {100 * count / total:.0f}%"})
+        
+        try:
+            if build_proxy(video_path, proxy_path, proxy_size, cancel_event, progress):
+                self.post_ui(self.on_proxy_ready, video_path, proxy_path)
+        except Exception as e:
+            self.post_ui(self.status_label.config, {'text': f"Proxy failed: {str(e)}"})
+    
+    def on_proxy_ready(self, video_path, proxy_path):
+        # The user may have switched videos or turned the proxy off meanwhile
+        if video_path != self.video_path or not self.use_proxy_var.get():
+            return
+        self.set_preview_source(proxy_path)
+        self.status_label.config(text=f"Proxy ready: {os.path.basename(video_path)}")
+    
+    def set_preview_source(self, proxy_path):
+        # Switch previews between the proxy and the source. Crop coordinates stay in
+        # source pixels since the display geometry is always computed from the source size
+        if proxy_path == self.proxy_path:
+            return
+        was_playing = self.is_playing
+        self.pause_playback()
+        
+        if self.video is not None:
+            self.video.release()
+        self.proxy_path = proxy_path
+        self.video = cv2.VideoCapture(proxy_path or self.video_path)
+        self.video_position = 0
+        self.frame_cache.clear()
+        
+        self.load_frame(self.current_frame)
+        if was_playing:
+            self.toggle_playback()
+    
+    def preview_path(self):
+        return self.proxy_path or self.video_path
+    
+    def preview_seek_args(self):
+        # Every proxy frame is a keyframe, so seeking it is always cheap
+        if self.proxy_path is not None:
+            return {'seek_threshold': SEEK_OVERHEAD_FRAMES, 'keyframes': None}
+        return {'seek_threshold': SEEK_THRESHOLD, 'keyframes': self.seek_keyframes()}
+    
+    def start_filmstrip(self):
+        if self.filmstrip_cancel is not None:
+            self.filmstrip_cancel.set()
+        self.filmstrip.delete("all")
+        self.filmstrip_photos = []
+        self.filmstrip_indices = thumbnail_indices(self.total_frames, FILMSTRIP_THUMBNAILS)
+        
+        # Fit the thumbnails side by side across the canvas, keeping the video's aspect ratio
+        slot_width = self.display_width // len(self.filmstrip_indices)
+        thumb_height = min(FILMSTRIP_HEIGHT, int(slot_width * self.height / self.width))
+        thumb_width = min(slot_width, int(thumb_height * self.width / self.height))
+        thumb_size = (max(1, thumb_width), max(1, thumb_height))
+        
+        thumbs_path = cache_file(self.video_path,
+                                 f"thumbs-{len(self.filmstrip_indices)}-{thumb_size[0]}x{thumb_size[1]}.npy")
+        if os.path.exists(thumbs_path):
+            try:
+                thumbs = np.load(thumbs_path)
+            except (OSError, ValueError):
+                thumbs = None
+            if thumbs is not None and len(thumbs) == len(self.filmstrip_indices):
+                for i, thumb in enumerate(thumbs):
+                    self.draw_thumbnail(i, thumb)
+                # The strip is drawn, but its frames still go to the frame cache in the background
+                thumbs_path = None
+        
+        self.filmstrip_cancel = Event()
+        Thread(target=self.build_filmstrip_worker,
+               args=(self.video_path, list(self.filmstrip_indices), thumb_size, self.update_display_geometry(),
+                     thumbs_path, self.filmstrip_cancel),
+               daemon=True).start()
+    
+    def build_filmstrip_worker(self, video_path, frame_indices, thumb_size, display_size, thumbs_path, cancel_event):
+        # Without a thumbs_path the strip is already drawn and only the frame cache is filled
+        def on_thumbnail(i, frame_idx, thumb, display_frame):
+            self.post_ui(self.on_thumbnail_ready, video_path, i, frame_idx,
+                         thumb.copy() if thumbs_path is not None else None, display_frame)
+        
+        try:
+            thumbs = build_thumbnails(video_path, frame_indices, thumb_size, display_size, cancel_event, on_thumbnail)
+            if thumbs is not None and thumbs_path is not None:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                np.save(thumbs_path, thumbs)
+        except Exception as e:
+            self.post_ui(self.status_label.config, {'text': f"Filmstrip failed: {str(e)}"})
+    
+    def on_thumbnail_ready(self, video_path, i, frame_idx, thumb, display_frame):
+        # The frame cache is keyed by frame number only, so drop frames of a video that's been closed
+        if video_path != self.video_path:
+            return
+        # Clicking this thumbnail will then be served from the frame cache
+        self.frame_cache.put(frame_idx, display_frame)
+        if thumb is not None:
+            self.draw_thumbnail(i, thumb)
+    
+    def draw_thumbnail(self, i, thumb):
+        slot_width = self.display_width // len(self.filmstrip_indices)
+        photo = ImageTk.PhotoImage(image=Image.fromarray(thumb))
+        self.filmstrip_photos.append(photo)
+        self.filmstrip.create_image(i * slot_width + slot_width // 2, FILMSTRIP_HEIGHT // 2, image=photo)
+        self.filmstrip.tag_raise('scene_cut')
+    
+    def on_filmstrip_click(self, event):
+        if self.video is None or not self.filmstrip_indices:
+            return
+        slot_width = self.display_width // len(self.filmstrip_indices)
+        i = min(len(self.filmstrip_indices) - 1, event.x // slot_width)
+        frame_num = self.filmstrip_indices[i]
+        self.load_frame(frame_num)
+        self.timeline.set(frame_num)
+        if self.is_playing:
+            self.start_read_ahead(frame_num + 1)
+    
     def toggle_manual_frame_entry(self):
         if self.manual_frame_checkbox.get():
             self.manual_frame_entry.config(state='normal')
@@ -239,6 +3184,8 @@ class VideoCropperApp:
                 frame_num = max(0, min(self.total_frames - 1, frame_num))
                 self.load_frame(frame_num)
                 self.timeline.set(frame_num)
+                if self.is_playing:
+                    self.start_read_ahead(frame_num + 1)
             except:
                 pass
     
@@ -306,88 +3253,391 @@ class VideoCropperApp:
         )
         
         if file_path:
-            self.video_path = file_path
-            self.video = cv2.VideoCapture(file_path)
-            
-            # Get video properties
-            self.total_frames = int(self.video.get(cv2.CAP_PROP_FRAME_COUNT))
-            self.fps = self.video.get(cv2.CAP_PROP_FPS)
-            self.width = int(self.video.get(cv2.CAP_PROP_FRAME_WIDTH))
-            self.height = int(self.video.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            
-            # Update UI
+            self.open_video(file_path)
+    
+    def open_video(self, file_path):
+        # A file OpenCV can't decode reports no frame size (0 or -1); keep the current video open instead
+        video = cv2.VideoCapture(file_path)
+        if video.get(cv2.CAP_PROP_FRAME_WIDTH) <= 0 or video.get(cv2.CAP_PROP_FRAME_HEIGHT) <= 0:
+            video.release()
+            self.status_label.config(text=f"Cannot read video: {os.path.basename(file_path)}")
+            return
+        
+        # Keep the settings of the previous video for next time
+        self.save_project()
+        
+        # Playback and the proxy of the previous video can't continue
+        self.pause_playback()
+        self.cancel_proxy_build()
+        self.proxy_path = None
+        
+        if self.video is not None:
+            self.video.release()
+        self.video_path = file_path
+        self.video = video
+        self.video_position = 0
+        self.seek_index = None
+        
+        # Get video properties
+        self.total_frames = int(self.video.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self.video.get(cv2.CAP_PROP_FPS)
+        self.width = int(self.video.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        
+        # Cached frames belong to the previous video
+        self.frame_cache.clear()
+        
+        # Update UI
+        self.timeline.config(to=self.total_frames - 1)
+        self.start_frame_var.set(0)
+        self.end_frame_var.set(self.total_frames - 1)
+        self.frame_label.config(text=f"Frame: 0/{self.total_frames}")
+        
+        # Enable controls
+        self.play_btn.config(state='normal')
+        self.stop_btn.config(state='normal')
+        self.crop_btn.config(state='normal')
+        self.export_job_btn.config(state='normal')
+        self.detect_scenes_btn.config(state='normal')
+        
+        # Load first frame
+        self.current_frame = 0
+        self.load_frame(0)
+        
+        self.status_label.config(text=f"Loaded: {os.path.basename(file_path)}")
+        self.restore_project()
+        try:
+            self.opened_settings = self.project_settings()
+        except tk.TclError:
+            self.opened_settings = None
+        
+        # Find the true frame count and keyframes without blocking the UI
+        Thread(target=self.build_seek_index, args=(file_path,), daemon=True).start()
+        
+        if self.use_proxy_var.get():
+            self.start_proxy_build()
+        
+        self.start_filmstrip()
+        
+        # Scenes are only detected on request, but earlier results show up right away
+        if self.scene_cancel is not None:
+            self.scene_cancel.set()
+            self.scene_cancel = None
+        self.show_scene_cuts(load_scene_cuts(file_path, scene_step(self.fps)) or [])
+    
+    def start_scene_detection(self):
+        if self.video_path is None or self.scene_cancel is not None:
+            return
+        self.scene_cancel = Event()
+        self.detect_scenes_btn.config(state='disabled')
+        self.status_label.config(text="Detecting scenes...")
+        Thread(target=self.detect_scenes_worker, args=(self.video_path, scene_step(self.fps), self.scene_cancel),
+               daemon=True).start()
+    
+    def detect_scenes_worker(self, video_path, step, cancel_event):
+        throttle = ProgressThrottle()
+        
+        def progress(done, total):
+            if total > 0 and throttle.ready(done, total):
+                self.post_ui(self.status_label.config, {'text': f"Detecting scenes... {100 * done / total:.0f}%"})
+        
+        try:
+            cuts = detect_scenes(video_path, step, cancel_event=cancel_event, progress=progress)
+            if cuts is not None:
+                self.post_ui(self.on_scenes_ready, video_path, cuts)
+        except Exception as e:
+            self.post_ui(self.status_label.config, {'text': f"Scene detection failed: {str(e)}"})
+            self.post_ui(self.on_scenes_ready, video_path, None)
+    
+    def on_scenes_ready(self, video_path, cuts):
+        if video_path != self.video_path:
+            return
+        self.scene_cancel = None
+        self.detect_scenes_btn.config(state='normal')
+        if cuts is not None:
+            self.show_scene_cuts(cuts)
+            self.status_label.config(text=f"Found {len(cuts) + 1} scenes")
+    
+    def show_scene_cuts(self, cuts):
+        self.scene_cuts = cuts
+        ranges = scene_ranges(cuts, self.total_frames) if cuts else []
+        self.scene_combo.config(values=[f"{start}-{end}" for start, end in ranges])
+        self.scene_var.set("")
+        self.draw_scene_marks()
+    
+    def draw_scene_marks(self):
+        # Cut positions along the filmstrip, which spans the whole video
+        self.filmstrip.delete('scene_cut')
+        if not self.filmstrip_indices or not self.total_frames:
+            return
+        strip_width = (self.display_width // len(self.filmstrip_indices)) * len(self.filmstrip_indices)
+        for cut in self.scene_cuts:
+            x = cut * strip_width / self.total_frames
+            self.filmstrip.create_line(x, 0, x, FILMSTRIP_HEIGHT, fill='red', width=2, tags='scene_cut')
+    
+    def on_scene_selected(self, event):
+        # Use the scene as the temporal crop and jump to its first frame
+        start, end = (int(value) for value in self.scene_var.get().split('-'))
+        self.start_frame_var.set(start)
+        self.end_frame_var.set(end)
+        self.load_frame(start)
+        self.timeline.set(start)
+    
+    def project_settings(self):
+        crop = None
+        if self.crop_x1 is not None:
+            crop = [self.crop_x1, self.crop_y1, self.crop_x2, self.crop_y2]
+        return {
+            'crop': crop,
+            'start_frame': self.start_frame_var.get(),
+            'end_frame': self.end_frame_var.get(),
+            'rescale': self.rescale_var.get(),
+            'target_width': self.target_width.get(),
+            'target_height': self.target_height.get(),
+            'interpolation': self.interpolation_var.get(),
+            'buckets': self.buckets_var.get(),
+            'drop_frames': self.drop_frames_var.get(),
+            'target_frames': self.target_frames.get(),
+            'pad_last_frame': self.pad_last_frame_var.get(),
+            'output_fps': self.output_fps.get(),
+        }
+    
+    def save_project(self):
+        # Write the open video's settings to its sidecar file, unless they are still the ones it
+        # was opened with, so merely browsing videos leaves no sidecars behind
+        if self.video_path is None:
+            return
+        try:
+            settings = self.project_settings()
+            if settings == self.opened_settings:
+                return
+            update_sidecar(self.video_path, settings=settings)
+            self.opened_settings = settings
+        except (OSError, tk.TclError) as e:
+            self.status_label.config(text=f"Cannot save project: {str(e)}")
+    
+    def restore_project(self):
+        data = load_sidecar(self.video_path)
+        if data is None or not data.get('settings'):
+            return
+        settings = data['settings']
+        for var, key in [(self.start_frame_var, 'start_frame'), (self.end_frame_var, 'end_frame'),
+                         (self.rescale_var, 'rescale'), (self.target_width, 'target_width'),
+                         (self.target_height, 'target_height'), (self.interpolation_var, 'interpolation'),
+                         (self.buckets_var, 'buckets'), (self.drop_frames_var, 'drop_frames'),
+                         (self.target_frames, 'target_frames'), (self.pad_last_frame_var, 'pad_last_frame'),
+                         (self.output_fps, 'output_fps')]:
+            if key in settings:
+                var.set(settings[key])
+        if settings.get('crop'):
+            self.crop_x1, self.crop_y1, self.crop_x2, self.crop_y2 = settings['crop']
+            self.update_coord_entries()
+            self.load_frame(self.current_frame)
+        self.status_label.config(text=f"Loaded: {os.path.basename(self.video_path)} (settings restored)")
+    
+    def on_close(self):
+        self.save_project()
+        self.root.destroy()
+    
+    def get_video_index(self):
+        if self.video_index is None:
+            self.video_index = VideoIndex()
+        return self.video_index
+    
+    def open_folder(self):
+        folder = filedialog.askdirectory(title="Select Video Folder")
+        if not folder:
+            return
+        self.browser_folder = folder
+        self.open_folder_btn.config(state='disabled')
+        self.status_label.config(text=f"Scanning {folder}...")
+        Thread(target=self.scan_folder_worker, args=(folder,), daemon=True).start()
+    
+    def scan_folder_worker(self, folder):
+        throttle = ProgressThrottle()
+        
+        def progress(done, total):
+            if throttle.ready(done, total):
+                self.post_ui(self.status_label.config, {'text': f"Probing videos... {done}/{total}"})
+        
+        try:
+            found, probed = self.get_video_index().scan(folder, progress=progress)
+            self.post_ui(self.on_folder_scanned, folder, found, probed)
+        except Exception as e:
+            self.post_ui(self.on_folder_scanned, folder, 0, 0, str(e))
+    
+    def on_folder_scanned(self, folder, found, probed, error=None):
+        self.open_folder_btn.config(state='normal')
+        if error is not None:
+            self.status_label.config(text=f"Folder scan failed: {error}")
+            return
+        self.status_label.config(text=f"Indexed {found} videos in {os.path.basename(folder)} ({probed} probed)")
+        self.show_video_browser()
+    
+    def show_video_browser(self):
+        if self.browser_window is not None and self.browser_window.winfo_exists():
+            self.browser_window.lift()
+            self.refresh_video_browser()
+            return
+        
+        # Not modal, so clips can be marked up while browsing
+        self.browser_window = tk.Toplevel(self.root)
+        self.browser_window.title("Videos")
+        self.browser_window.geometry("720x480")
+        
+        filter_frame = ttk.LabelFrame(self.browser_window, text="Filters", padding="10")
+        filter_frame.pack(fill=tk.X, padx=10, pady=5)
+        for column, (label, var) in enumerate([("Min Width:", self.filter_min_width),
+                                               ("Min Height:", self.filter_min_height),
+                                               ("Min FPS:", self.filter_min_fps),
+                                               ("Max FPS:", self.filter_max_fps),
+                                               ("Min Seconds:", self.filter_min_seconds),
+                                               ("Max Seconds:", self.filter_max_seconds)]):
+            row, column = divmod(column, 3)
+            ttk.Label(filter_frame, text=label).grid(row=row, column=2 * column, sticky=tk.W, pady=2)
+            ttk.Entry(filter_frame, textvariable=var, width=8).grid(row=row, column=2 * column + 1, padx=5, pady=2)
+        ttk.Label(filter_frame, text="Exported:").grid(row=2, column=0, sticky=tk.W, pady=2)
+        ttk.Combobox(filter_frame, textvariable=self.filter_exported, values=['Any', 'Yes', 'No'],
+                     state='readonly', width=6).grid(row=2, column=1, padx=5, pady=2)
+        ttk.Button(filter_frame, text="Apply", command=self.refresh_video_browser).grid(row=2, column=5, pady=2)
+        
+        columns = [('name', "Video", 300), ('resolution', "Resolution", 100), ('fps', "FPS", 60),
+                   ('seconds', "Seconds", 80), ('exported', "Exported", 70)]
+        self.browser_tree = ttk.Treeview(self.browser_window, columns=[c[0] for c in columns], show='headings')
+        for column, heading, width in columns:
+            self.browser_tree.heading(column, text=heading)
+            self.browser_tree.column(column, width=width, stretch=column == 'name')
+        self.browser_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.browser_tree.bind("<Double-1>", lambda event: self.open_selected_video())
+        
+        browser_buttons = ttk.Frame(self.browser_window)
+        browser_buttons.pack(pady=5)
+        ttk.Button(browser_buttons, text="Open", command=self.open_selected_video).pack(side=tk.LEFT, padx=5)
+        ttk.Button(browser_buttons, text="Next Clip", command=self.open_next_video).pack(side=tk.LEFT, padx=5)
+        
+        self.refresh_video_browser()
+    
+    def refresh_video_browser(self):
+        if self.browser_window is None or not self.browser_window.winfo_exists():
+            return
+        try:
+            # 0 means no upper limit
+            videos = self.get_video_index().query(
+                self.browser_folder,
+                min_width=self.filter_min_width.get(),
+                min_height=self.filter_min_height.get(),
+                min_fps=self.filter_min_fps.get(),
+                max_fps=self.filter_max_fps.get() or None,
+                min_seconds=self.filter_min_seconds.get(),
+                max_seconds=self.filter_max_seconds.get() or None,
+                exported={'Any': None, 'Yes': True, 'No': False}[self.filter_exported.get()])
+        except tk.TclError:
+            messagebox.showerror("Invalid Filter", "Filter values must be numbers!")
+            return
+        
+        self.browser_tree.delete(*self.browser_tree.get_children())
+        for video in videos:
+            if video['error']:
+                resolution = "unreadable"
+            else:
+                resolution = f"{video['width']}x{video['height']}"
+            self.browser_tree.insert('', tk.END, iid=video['path'], values=(
+                os.path.relpath(video['path'], self.browser_folder), resolution, f"{video['fps']:.2f}",
+                f"{video['seconds']:.1f}", "yes" if video['exported'] else ""))
+    
+    def open_selected_video(self):
+        selection = self.browser_tree.selection()
+        if selection:
+            self.open_video(selection[0])
+    
+    def open_next_video(self):
+        # The clip after the open one in the filtered list, or the first one
+        items = self.browser_tree.get_children()
+        if not items:
+            return
+        current = os.path.abspath(self.video_path) if self.video_path else None
+        position = items.index(current) + 1 if current in items else 0
+        if position < len(items):
+            self.browser_tree.selection_set(items[position])
+            self.browser_tree.see(items[position])
+            self.open_video(items[position])
+    
+    def build_seek_index(self, video_path):
+        index = SeekIndex.load_or_build(video_path)
+        if index is not None:
+            self.post_ui(self.on_seek_index_ready, video_path, index)
+    
+    def on_seek_index_ready(self, video_path, index):
+        # Ignore indexes of a video that has been replaced in the meantime
+        if video_path != self.video_path:
+            return
+        
+        self.seek_index = index
+        if index.frame_count != self.total_frames:
+            if self.end_frame_var.get() == self.total_frames - 1:
+                self.end_frame_var.set(index.frame_count - 1)
+                # Not a change worth saving
+                if self.opened_settings is not None and self.opened_settings['end_frame'] == self.total_frames - 1:
+                    self.opened_settings['end_frame'] = index.frame_count - 1
+            self.total_frames = index.frame_count
             self.timeline.config(to=self.total_frames - 1)
-            self.start_frame_var.set(0)
-            self.end_frame_var.set(self.total_frames - 1)
-            self.frame_label.config(text=f"Frame: 0/{self.total_frames}")
-            
-            # Enable controls
-            self.play_btn.config(state='normal')
-            self.stop_btn.config(state='normal')
-            self.crop_btn.config(state='normal')
-            
-            # Load first frame
-            self.current_frame = 0
-            self.load_frame(0)
-            
-            self.status_label.config(text=f"Loaded: {os.path.basename(file_path)}")
+            self.frame_label.config(text=f"Frame: {self.current_frame}/{self.total_frames}")
+        
+        self.status_label.config(text=f"Indexed: {os.path.basename(video_path)} "
+                                      f"({index.frame_count} frames, {len(index.keyframes)} keyframes)")
+    
+    def seek_keyframes(self):
+        return self.seek_index.keyframes if self.seek_index is not None else None
     
     def load_frame(self, frame_num):
         if self.video is None:
             return
-            
-        self.video.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
-        ret, frame = self.video.read()
+        
+        stage = self.preview_timer.stage
+        frame_resized = self.frame_cache.get(frame_num)
+        if frame_resized is None:
+            # Seek to the nearest keyframe (or keep decoding forward) instead of a blind seek
+            ret = False
+            for _, frame in read_frames(self.video, [frame_num], position=self.video_position,
+                                        timer=self.preview_timer, **self.preview_seek_args()):
+                ret = True
+            self.video_position = frame_num + 1 if ret else None
+        else:
+            ret = True
         
         if ret:
-            self.current_frame = frame_num
-            
-            # Convert to RGB
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Calculate aspect ratio and scaling factors
-            video_aspect = self.width / self.height
-            display_aspect = self.display_width / self.display_height
-            
-            if video_aspect > display_aspect:
-                # Video is wider than display
-                scale = self.display_width / self.width
-                new_width = self.display_width
-                new_height = int(self.height * scale)
-            else:
-                # Video is taller than display
-                scale = self.display_height / self.height
-                new_width = int(self.width * scale)
-                new_height = self.display_height
-            
-            # Calculate offsets for centering
-            self.display_x_offset = (self.display_width - new_width) // 2
-            self.display_y_offset = (self.display_height - new_height) // 2
-            self.display_scale = scale
-            
-            # Resize for display while maintaining aspect ratio
-            frame_resized = cv2.resize(frame_rgb, (new_width, new_height))
-            
-            # Create a black background and place the resized frame in the center
-            frame_display = np.zeros((self.display_height, self.display_width, 3), dtype=np.uint8)
-            frame_display[self.display_y_offset:self.display_y_offset+new_height, 
-                         self.display_x_offset:self.display_x_offset+new_width] = frame_resized
+            new_width, new_height = self.update_display_geometry()
             
-            # Convert to PIL Image
-            self.photo = ImageTk.PhotoImage(image=Image.fromarray(frame_display))
+            if frame_resized is None:
+                # Convert to RGB and resize for display while maintaining aspect ratio
+                with stage('display convert'):
+                    frame_resized = to_display_frame(frame, (new_width, new_height))
+                self.frame_cache.put(frame_num, frame_resized)
             
-            # Clear canvas
-            self.canvas.delete("all")
-            
-            # Draw frame
-            self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo)
-            
-            # Draw crop rectangle if exists
-            if self.crop_x1 is not None and self.crop_y1 is not None and self.crop_x2 is not None and self.crop_y2 is not None:
-                self.draw_crop_rectangle()
-            
-            # Update label
-            self.frame_label.config(text=f"Frame: {frame_num}/{self.total_frames}")
+            with stage('draw'):
+                self.show_display_frame(frame_num, frame_resized)
+    
+    def update_display_geometry(self):
+        self.renderer.configure(self.width, self.height, self.display_width, self.display_height)
+        self.display_x_offset = self.renderer.x_offset
+        self.display_y_offset = self.renderer.y_offset
+        self.display_scale = self.renderer.scale
+        return self.renderer.frame_width, self.renderer.frame_height
+    
+    def show_display_frame(self, frame_num, frame_resized):
+        self.current_frame = frame_num
+        
+        # Draw frame into the persistent canvas image
+        self.update_display_geometry()
+        self.renderer.draw(frame_resized)
+        
+        # Draw crop rectangle if exists
+        if self.crop_x1 is not None and self.crop_y1 is not None and self.crop_x2 is not None and self.crop_y2 is not None:
+            self.draw_crop_rectangle()
+        
+        # Update labels
+        self.frame_label.config(text=f"Frame: {frame_num}/{self.total_frames}")
+        self.cache_label.config(text=self.frame_cache.stats_text())
     
     def draw_crop_rectangle(self):
         if self.crop_x1 is None:
@@ -399,11 +3649,19 @@ class VideoCropperApp:
         x2 = self.display_x_offset + self.crop_x2 * self.display_scale
         y2 = self.display_y_offset + self.crop_y2 * self.display_scale
         
+        handle_size = 8
+        
+        # Move the existing overlay if there is one
+        if self.canvas.find_withtag('crop_rect'):
+            self.canvas.coords('crop_rect', x1, y1, x2, y2)
+            self.canvas.coords('top_left_handle', x1-handle_size, y1-handle_size, x1+handle_size, y1+handle_size)
+            self.canvas.coords('bottom_right_handle', x2-handle_size, y2-handle_size, x2+handle_size, y2+handle_size)
+            return
+        
         # Draw rectangle
         self.canvas.create_rectangle(x1, y1, x2, y2, outline='red', width=2, tags='crop_rect')
         
         # Draw handles
-        handle_size = 8
         # Top-left handle
         self.canvas.create_rectangle(x1-handle_size, y1-handle_size, x1+handle_size, y1+handle_size, 
                                     fill='red', outline='white', tags='top_left_handle')
@@ -540,9 +3798,6 @@ class VideoCropperApp:
                 self.crop_y1, self.crop_y2 = self.crop_y2, self.crop_y1
         
         # Redraw
-        self.canvas.delete('crop_rect')
-        self.canvas.delete('top_left_handle')
-        self.canvas.delete('bottom_right_handle')
         self.draw_crop_rectangle()
         
         # Update coordinate entries
@@ -563,6 +3818,25 @@ class VideoCropperApp:
         if self.maintain_aspect.get():
             self.on_aspect_change()
     
+    def auto_crop(self):
+        # Crop away letterboxing and static borders seen across the selected frame range
+        if self.video_path is None:
+            return
+        start = max(0, min(self.total_frames - 1, self.start_frame_var.get()))
+        end = max(start, min(self.total_frames - 1, self.end_frame_var.get()))
+        try:
+            rect = auto_crop(self.video_path, start, end, self.seek_keyframes(), proxy_path=self.proxy_path)
+        except Exception as e:
+            messagebox.showerror("Error", f"Auto crop failed: {str(e)}")
+            return
+        if self.maintain_aspect.get() and self.aspect_ratio is not None:
+            rect = fit_aspect(rect, self.aspect_ratio)
+        
+        self.crop_x1, self.crop_y1, self.crop_x2, self.crop_y2 = rect
+        self.update_coord_entries()
+        self.load_frame(self.current_frame)
+        self.status_label.config(text=f"Crop area: {rect[0]}-{rect[2]}, {rect[1]}-{rect[3]}")
+    
     def update_coord_entries(self):
         if self.crop_x1 is not None:
             self.coord_entries["X1:"].delete(0, tk.END)
@@ -579,34 +3853,109 @@ class VideoCropperApp:
     
     def toggle_playback(self):
         if self.is_playing:
-            self.is_playing = False
-            self.play_btn.config(text="Play")
+            self.pause_playback()
         else:
             self.is_playing = True
             self.play_btn.config(text="Pause")
-            self.playback_thread = Thread(target=self.play_video)
-            self.playback_thread.start()
+            self.playback_clock = PlaybackClock(self.fps, self.current_frame + 1)
+            self.start_read_ahead(self.current_frame + 1)
+            self.playback_tick()
     
-    def play_video(self):
-        while self.is_playing and self.current_frame < self.total_frames - 1:
-            self.load_frame(self.current_frame + 1)
-            self.timeline.set(self.current_frame)
-            self.root.update()
-            time.sleep(1.0 / self.fps)
-        
+    def pause_playback(self):
         self.is_playing = False
+        if self.playback_after_id is not None:
+            self.root.after_cancel(self.playback_after_id)
+            self.playback_after_id = None
+        self.stop_read_ahead()
         self.play_btn.config(text="Play")
+        if self.playback_clock is not None and self.playback_clock.shown > 1:
+            self.status_label.config(text=self.playback_clock.stats_text())
+    
+    def start_read_ahead(self, start_frame):
+        # (Re)start decoding ahead of playback from start_frame, discarding anything queued
+        self.stop_read_ahead()
+        self.pending_playback_frame = None
+        if self.playback_clock is not None:
+            self.playback_clock.restart(start_frame)
+        if self.video is None or start_frame >= self.total_frames:
+            return
+        display_size = self.update_display_geometry()
+        self.read_ahead = ReadAheadDecoder(self.preview_path(), start_frame, self.total_frames - 1,
+                                           display_size, clock=self.playback_clock,
+                                           **self.preview_seek_args()).start()
+    
+    def stop_read_ahead(self):
+        if self.read_ahead is not None:
+            self.read_ahead.stop()
+            self.read_ahead = None
+    
+    def playback_tick(self):
+        # Runs on the Tk loop: show the newest frame that is due and drop the ones we're late for
+        self.playback_after_id = None
+        if not self.is_playing or self.read_ahead is None:
+            self.pause_playback()
+            return
+        
+        clock = self.playback_clock
+        due = clock.due_frame(time.monotonic())
+        frame_item = None
+        ended = False
+        while True:
+            if self.pending_playback_frame is not None:
+                item = self.pending_playback_frame
+                self.pending_playback_frame = None
+            else:
+                try:
+                    item = self.read_ahead.get_nowait()
+                except queue.Empty:
+                    # The decoder is behind; it skips the frames whose time has passed
+                    break
+            if item is None:
+                ended = True
+                break
+            if item[0] > due:
+                # Not due yet, keep it for a later tick
+                self.pending_playback_frame = item
+                break
+            if frame_item is not None:
+                clock.add_dropped(1)
+            frame_item = item
+        
+        if frame_item is not None:
+            frame_num, frame_resized = frame_item
+            self.frame_cache.put(frame_num, frame_resized)
+            self.show_display_frame(frame_num, frame_resized)
+            self.timeline.set(frame_num)
+            clock.record_shown(time.monotonic())
+            if clock.shown % 15 == 0:
+                self.status_label.config(text=clock.stats_text())
+        
+        if ended:
+            self.pause_playback()
+            return
+        
+        # Sleep until the next frame's deadline
+        if self.pending_playback_frame is not None:
+            next_deadline = clock.deadline(self.pending_playback_frame[0])
+        else:
+            next_deadline = clock.deadline(due + 1)
+        delay_ms = max(1, int((next_deadline - time.monotonic()) * 1000))
+        self.playback_after_id = self.root.after(delay_ms, self.playback_tick)
     
     def stop_playback(self):
-        self.is_playing = False
+        self.pause_playback()
         self.current_frame = 0
         self.load_frame(0)
         self.timeline.set(0)
-        self.play_btn.config(text="Play")
     
     def on_timeline_change(self, value):
         frame_num = int(float(value))
+        # Setting the timeline during playback calls back here with the frame just shown
+        if frame_num == self.current_frame:
+            return
         self.load_frame(frame_num)
+        if self.is_playing:
+            self.start_read_ahead(frame_num + 1)
     
     def reset_selection(self):
         self.crop_x1 = None
@@ -619,51 +3968,12 @@ class VideoCropperApp:
         self.status_label.config(text="No crop area selected")
         self.update_coord_entries()
     
-    def create_progress_window(self):
-        # Create a new top-level window for progress
-        self.progress_window = tk.Toplevel(self.root)
-        self.progress_window.title("Processing Video")
-        self.progress_window.geometry("400x150")
-        
-        # Center the progress window
-        self.progress_window.transient(self.root)
-        self.progress_window.grab_set()
-        
-        # Progress bar
-        self.progress_bar = ttk.Progressbar(self.progress_window, length=300, mode='determinate')
-        self.progress_bar.pack(pady=15)
-        
-        # Status label
-        self.progress_label = ttk.Label(self.progress_window, text="Initializing...")
-        self.progress_label.pack()
-        
-        # Make window non-resizable
-        self.progress_window.resizable(False, False)
-        
-        # Position in center of parent window
-        self.progress_window.update()
-        x = (self.progress_window.winfo_screenwidth() // 2) - (self.progress_window.winfo_width() // 2)
-        y = (self.progress_window.winfo_screenheight() // 2) - (self.progress_window.winfo_height() // 2)
-        self.progress_window.geometry(f"+{x}+{y}")
-        
-    def update_progress(self, value, message):
-        if self.progress_bar:
-            self.progress_bar['value'] = value
-        if self.progress_label:
-            self.progress_label['text'] = message
-        self.progress_window.update()
-    
-    def close_progress_window(self):
-        if self.progress_window:
-            self.progress_window.destroy()
-            self.progress_window = None
-    
-    def crop_video(self):
+    def validated_frame_range(self):
+        # Get temporal crop values, or None after telling the user what's wrong
         if self.crop_x1 is None:
             messagebox.showwarning("No Selection", "Please select a crop area first!")
-            return
+            return None
         
-        # Get temporal crop values
         start_frame = self.start_frame_var.get()
         end_frame = self.end_frame_var.get()
         
@@ -672,121 +3982,290 @@ class VideoCropperApp:
         
         if start_frame < 0 or end_frame >= self.total_frames or start_frame > end_frame:
             messagebox.showerror("Invalid Frame Range", "Invalid start/end frame values!")
+            return None
+        return start_frame, end_frame
+    
+    def current_export_job(self, output_path, start_frame, end_frame):
+        # Snapshot the current settings as a GUI-independent job
+        return ExportJob(
+            input_path=self.video_path,
+            output_path=output_path,
+            crop=(self.crop_x1, self.crop_y1, self.crop_x2, self.crop_y2),
+            start_frame=start_frame,
+            end_frame=end_frame,
+            rescale=self.rescale_var.get(),
+            target_width=self.target_width.get(),
+            target_height=self.target_height.get(),
+            interpolation=self.interpolation_var.get(),
+            drop_frames=self.drop_frames_var.get(),
+            target_frames=self.target_frames.get(),
+            pad_last_frame=self.pad_last_frame_var.get(),
+            output_fps=self.output_fps.get(),
+            chunks=max(1, self.chunks_var.get()),
+            workers=max(1, self.workers_var.get()),
+            encoder=self.encoder_var.get(),
+            codec=self.codec_var.get(),
+            crf=self.crf_var.get(),
+            preset=self.preset_var.get(),
+            pix_fmt=self.pix_fmt_var.get(),
+            encoder_threads=self.encoder_threads_var.get(),
+            fast_trim=self.fast_trim_var.get(),
+            allow_keyframe_snap=self.keyframe_snap_var.get(),
+            output_format=self.output_format_var.get(),
+            write_report=self.write_report_var.get(),
+            checkpoint_frames=max(0, self.checkpoint_frames_var.get()),
+        )
+    
+    def current_export_jobs(self, output_path, start_frame, end_frame):
+        # The current job, followed by one job per size bucket. None after telling the user what's wrong
+        job = self.current_export_job(output_path, start_frame, end_frame)
+        try:
+            buckets = parse_buckets(self.buckets_var.get())
+        except ValueError as e:
+            messagebox.showerror("Invalid Buckets", str(e))
+            return None
+        return [job] + bucket_jobs(job, buckets)
+    
+    def export_job_line(self):
+        frame_range = self.validated_frame_range()
+        if frame_range is None:
             return
         
-        # Get output file path
-        output_path = filedialog.asksaveasfilename(
-            title="Save Cropped Video",
+        output_path = self.ask_output_path("Output Video for Job")
+        if not output_path:
+            return
+        
+        jobs_path = filedialog.asksaveasfilename(
+            title="Append Job to List",
+            defaultextension=".jsonl",
+            filetypes=[("Job lists", "*.jsonl")],
+            confirmoverwrite=False
+        )
+        if not jobs_path:
+            return
+        
+        jobs = self.current_export_jobs(output_path, *frame_range)
+        if jobs is None:
+            return
+        with open(jobs_path, 'a') as f:
+            for job in jobs:
+                f.write(json.dumps(job.to_dict()) + "\n")
+        self.status_label.config(text=f"Job appended to {os.path.basename(jobs_path)}")
+    
+    def ask_output_path(self, title):
+        output_format = self.output_format_var.get()
+        if output_format in ('png', 'jpg'):
+            # Image sequences are written into a directory
+            return filedialog.askdirectory(title=f"{title} ({output_format.upper()} sequence directory)")
+        if output_format == 'npy':
+            return filedialog.asksaveasfilename(title=title, defaultextension=".npy",
+                                                filetypes=[("NumPy arrays", "*.npy")])
+        return filedialog.asksaveasfilename(
+            title=title,
             defaultextension=".mp4",
             filetypes=[("MP4 files", "*.mp4")]
         )
+    
+    def crop_video(self):
+        frame_range = self.validated_frame_range()
+        if frame_range is None:
+            return
+        start_frame, end_frame = frame_range
+        
+        # Get output file path
+        output_path = self.ask_output_path("Save Cropped Video")
+        
+        if not output_path:
+            return
+        
+        # The job is a snapshot, so editing can go on while it waits for a worker.
+        # Size buckets share one decode pass
+        jobs = self.current_export_jobs(output_path, start_frame, end_frame)
+        if jobs is None:
+            return
+        self.enqueue_export(jobs)
+        self.status_label.config(text=f"Queued {os.path.basename(output_path)}")
+    
+    def add_clip(self):
+        # Queue the current crop and range as one more output of a shared export
+        frame_range = self.validated_frame_range()
+        if frame_range is None:
+            return
         
+        output_path = self.ask_output_path("Save Clip")
         if not output_path:
             return
         
-        # Create progress window
-        self.create_progress_window()
+        jobs = self.current_export_jobs(output_path, *frame_range)
+        if jobs is None:
+            return
+        for job in jobs:
+            self.clip_jobs.append(job)
+            x1, y1, x2, y2 = job.crop
+            self.clip_listbox.insert(tk.END, f"{os.path.basename(job.output_path)}: ({x1}, {y1})-({x2}, {y2}), "
+                                             f"frames {job.start_frame}-{job.end_frame}")
+    
+    def remove_clip(self):
+        for index in reversed(self.clip_listbox.curselection()):
+            self.clip_listbox.delete(index)
+            del self.clip_jobs[index]
+    
+    def export_clips(self):
+        if not self.clip_jobs:
+            messagebox.showwarning("No Clips", "Please add clips to the list first!")
+            return
         
-        # Disable controls during processing
-        self.crop_btn.config(state='disabled')
+        # One shared decode pass per source video in the list
+        groups = {}
+        for job in self.clip_jobs:
+            groups.setdefault(job.input_path, []).append(job)
+        for group in groups.values():
+            self.enqueue_export(group)
         
-        # Process video in background thread
-        Thread(target=self.process_video, args=(output_path, start_frame, end_frame)).start()
+        self.status_label.config(text=f"Queued {len(self.clip_jobs)} clips from {len(groups)} videos")
+        self.clip_jobs.clear()
+        self.clip_listbox.delete(0, tk.END)
     
-    def process_video(self, output_path, start_frame, end_frame):
+    def enqueue_export(self, jobs):
+        entry = self.export_queue.submit(jobs, report_extra={'preview_stages': self.preview_timer.snapshot()})
+        self.queue_entries[entry.entry_id] = entry
+        # Remember the outputs in the source's sidecar so they can be rebuilt later
         try:
-            cap = cv2.VideoCapture(self.video_path)
-            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-            
-            # Get original crop dimensions
-            orig_width = int(self.crop_x2 - self.crop_x1)
-            orig_height = int(self.crop_y2 - self.crop_y1)
-            
-            # Determine target dimensions
-            if self.rescale_var.get():
-                target_w = self.target_width.get()
-                target_h = self.target_height.get()
-            else:
-                target_w = orig_width
-                target_h = orig_height
-            
-            # Calculate frame indices to process
-            total_input_frames = end_frame - start_frame + 1
-            if self.drop_frames_var.get():
-                # Calculate step size for uniform sampling
-                target_count = self.target_frames.get()
-                step = max(1, total_input_frames / target_count)
-                frame_indices = [start_frame + int(i * step) for i in range(target_count)]
-                frame_indices[-1] = min(frame_indices[-1], end_frame)  # Ensure last frame doesn't exceed
-            else:
-                # Process all frames
-                frame_indices = list(range(start_frame, end_frame + 1))
-            
-            # Open output video writer
-            output_fps = self.output_fps.get()
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_path, fourcc, output_fps, (target_w, target_h))
-            
-            processed_count = 0
-            total_to_process = len(frame_indices)
-            
-            self.update_progress(0, f"Processing {total_to_process} frames...")
-            
-            for frame_idx in frame_indices:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # Crop frame
-                cropped_frame = frame[int(self.crop_y1):int(self.crop_y2),
-                                    int(self.crop_x1):int(self.crop_x2)]
-                
-                # Rescale if needed
-                if self.rescale_var.get():
-                    cropped_frame = cv2.resize(
-                        cropped_frame,
-                        (target_w, target_h),
-                        interpolation=cv2.INTER_LANCZOS4
-                    )
-                
-                # Write to output
-                out.write(cropped_frame)
-                processed_count += 1
-                
-                # Update progress periodically
-                if processed_count % 10 == 0 or processed_count == 1:
-                    progress = (processed_count / total_to_process) * 100
-                    self.update_progress(progress, f"Processing frame {processed_count}/{total_to_process}")
-            
-            # Handle padding if needed
-            if self.pad_last_frame_var.get() and len(frame_indices) > 0:
-                # Write the last frame one more time
-                out.write(cropped_frame)
-                self.update_progress(100, "Padding last frame...")
-            
-            # Cleanup
-            cap.release()
-            out.release()
-            
-            # Update progress to 100% and show success
-            self.update_progress(100, "Processing complete!")
-            time.sleep(1)
-            
-            # Close progress window and show success
-            self.close_progress_window()
-            self.status_label.config(text=f"Video processed successfully! Saved to {os.path.basename(output_path)}")
-            messagebox.showinfo("Success", "Video cropped and processed successfully!")
-            
-        except Exception as e:
-            self.close_progress_window()
-            self.status_label.config(text=f"Error: {str(e)}")
-            messagebox.showerror("Error", f"Failed to process video: {str(e)}")
-        finally:
-            # Re-enable controls after processing
-            self.crop_btn.config(state='normal')
+            update_sidecar(jobs[0].input_path, outputs=jobs)
+        except OSError as e:
+            self.status_label.config(text=f"Cannot save project: {str(e)}")
+    
+    def on_export_workers_change(self, *args):
+        try:
+            self.export_queue.set_workers(self.export_workers_var.get())
+        except tk.TclError:
+            # Ignore partial input while typing
+            return
+    
+    def refresh_queue_entry(self, entry, status):
+        item = str(entry.entry_id)
+        if entry.entry_id not in self.queue_entries:
+            # Cleared while an update was on its way
+            return
+        if status != entry.status:
+            # Stale event; the one for the current status is still on its way
+            return
+        if len(entry.jobs) == 1:
+            output = os.path.basename(entry.jobs[0].output_path)
+        else:
+            output = f"{len(entry.jobs)} clips of {os.path.basename(entry.jobs[0].input_path)}"
+        if entry.status == 'done':
+            progress = self.result_details(entry.results)
+        elif entry.status == 'failed':
+            progress = entry.error
+        else:
+            progress = entry.progress_text()
+        values = (output, entry.status, progress)
+        if self.queue_tree.exists(item):
+            self.queue_tree.item(item, values=values)
+        else:
+            self.queue_tree.insert('', tk.END, iid=item, values=values)
+        
+        if entry.status == 'done':
+            if entry.completion_handled:
+                return
+            entry.completion_handled = True
+            for job in entry.jobs:
+                self.get_video_index().record_export(job.input_path, job.output_path)
+            try:
+                update_sidecar(entry.jobs[0].input_path,
+                               builds={job.output_path: job_hash(job) for job in entry.jobs})
+            except OSError:
+                pass
+            self.refresh_video_browser()
+            self.status_label.config(text=f"Video processed successfully! Saved to {output} "
+                                          f"({self.result_details(entry.results)})")
+        elif entry.status == 'failed':
+            self.status_label.config(text=f"Error: {entry.error}")
+        elif entry.status == 'cancelled':
+            self.status_label.config(text=f"Cancelled {output}")
+    
+    def result_details(self, results):
+        if len(results) > 1:
+            return f"{len(results)} clips at {results[0]['fps']:.1f} fps"
+        result = results[0]
+        if result['method'] == 'encode':
+            slowest = max(result['stages'], key=lambda name: result['stages'][name]['seconds'])
+            return f"{result['fps']:.1f} fps, slowest stage: {slowest}"
+        # Copied trims may start at an earlier keyframe than requested
+        return (f"{result['method']}, frames {result['actual_start_frame']}-{result['actual_end_frame']}"
+                f" in {result['seconds']:.1f}s")
+    
+    def selected_queue_entries(self):
+        return [self.queue_entries[int(item)] for item in self.queue_tree.selection()]
+    
+    def cancel_selected_exports(self):
+        for entry in self.selected_queue_entries():
+            self.export_queue.cancel(entry)
+    
+    def retry_selected_exports(self):
+        for entry in self.selected_queue_entries():
+            self.export_queue.retry(entry)
+    
+    def clear_finished_exports(self):
+        for entry in self.export_queue.clear_finished():
+            del self.queue_entries[entry.entry_id]
+            self.queue_tree.delete(str(entry.entry_id))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Spatio-temporal video cropper. Starts the GUI unless a job list is given.")
+    parser.add_argument('--jobs', help="JSON list or JSONL file of export jobs to run headlessly")
+    parser.add_argument('--processes', type=int, default=None, help="Jobs run in parallel (default: CPU count)")
+    parser.add_argument('--rebuild', nargs='+', metavar='PATH',
+                        help="Re-export the outputs recorded in the sidecar files of these videos or folders "
+                             "whose source or settings changed")
+    parser.add_argument('--force', action='store_true', help="With --rebuild, re-export every output")
+    parser.add_argument('--bench-encoders', metavar='VIDEO',
+                        help="Compare encode fps and output size of the available encoder backends")
+    parser.add_argument('--bench', action='store_true',
+                        help="Benchmark export, seek and preview paths on synthetic videos and print JSON")
+    parser.add_argument('--bench-quick', action='store_true', help="Benchmark a single small video only")
+    parser.add_argument('--bench-output', metavar='FILE', help="Also save the benchmark results to FILE")
+    parser.add_argument('--bench-baseline', metavar='FILE', help="Flag regressions against saved results")
+    parser.add_argument('--bench-tolerance', type=float, default=0.15,
+                        help="Relative slowdown tolerated before flagging a regression (default: 0.15)")
+    args = parser.parse_args(argv)
+    
+    if args.bench or args.bench_quick:
+        results = run_benchmarks(quick=args.bench_quick)
+        report = {'results': results}
+        if args.bench_baseline:
+            with open(args.bench_baseline, 'r') as f:
+                baseline = json.load(f)
+            report['regressions'] = compare_benchmarks(results, baseline.get('results', baseline),
+                                                       args.bench_tolerance)
+        if args.bench_output:
+            with open(args.bench_output, 'w') as f:
+                json.dump(report, f, indent=2)
+        print(json.dumps(report, indent=2), flush=True)
+        return 1 if report.get('regressions') else 0
+    
+    if args.bench_encoders:
+        for result in benchmark_encoders(args.bench_encoders):
+            print(json.dumps(result), flush=True)
+        return 0
+    
+    if args.jobs is None and args.rebuild is None:
+        root = tk.Tk()
+        app = VideoCropperApp(root)
+        root.mainloop()
+        return 0
+    
+    def print_result(result):
+        print(json.dumps(result), flush=True)
+    
+    if args.rebuild is not None:
+        results, summary = rebuild(args.rebuild, args.processes, args.force, print_result)
+    else:
+        results, summary = run_jobs(load_job_list(args.jobs), args.processes, print_result)
+    print(json.dumps({'summary': summary}), flush=True)
+    return 0 if summary['failed'] == 0 else 1
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = VideoCropperApp(root)
-    root.mainloop()
+    sys.exit(main())